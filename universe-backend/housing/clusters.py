@@ -0,0 +1,80 @@
+# housing/clusters.py
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import Substr
+
+from .geo import cell_size
+from .models import HousingListing, ListingGridCell
+
+# Geohash lengths kept in ListingGridCell, roughly 5000 km down to 150 m cells
+CLUSTER_PRECISIONS = range(1, 8)
+# Prefix ranges OR-ed into a single refresh query
+REFRESH_CHUNK = 100
+SAVE_BATCH = 1000
+
+
+def precision_for_zoom(zoom):
+    """The finest cluster precision whose cells are at least half a 256px map tile wide."""
+    tile_width = 360.0 / 2 ** zoom
+    precision = CLUSTER_PRECISIONS[0]
+    for candidate in CLUSTER_PRECISIONS:
+        if cell_size(candidate)[1] >= tile_width / 2:
+            precision = candidate
+    return precision
+
+
+def clustered_listings():
+    return HousingListing.objects.filter(is_sold=False).exclude(geohash='')
+
+
+def _aggregate(listings, precision):
+    return listings.annotate(cell=Substr('geohash', 1, precision)).values('cell').annotate(
+        count=Count('id'),
+        latitude=Avg('latitude'),
+        longitude=Avg('longitude'),
+        min_price=Min('price'),
+        max_price=Max('price'),
+    ).order_by()
+
+
+def _save_cells(precision, rows):
+    rows = iter(rows)
+    while batch := list(islice(rows, SAVE_BATCH)):
+        ListingGridCell.objects.bulk_create(
+            [ListingGridCell(precision=precision, geohash=row['cell'], **{
+                field: value for field, value in row.items() if field != 'cell'
+            }) for row in batch],
+            update_conflicts=True,
+            unique_fields=['precision', 'geohash'],
+            update_fields=['count', 'latitude', 'longitude', 'min_price', 'max_price'],
+        )
+
+
+def refresh_cells(geohashes):
+    """
+    Recompute the grid cells containing any of ``geohashes`` at every
+    cluster precision, dropping cells that no longer hold a listing.
+    """
+    geohashes = {geohash for geohash in geohashes if geohash}
+    for precision in CLUSTER_PRECISIONS:
+        prefixes = sorted({geohash[:precision] for geohash in geohashes})
+        for start in range(0, len(prefixes), REFRESH_CHUNK):
+            chunk = prefixes[start:start + REFRESH_CHUNK]
+            ranges = Q()
+            for prefix in chunk:
+                ranges |= Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+            rows = list(_aggregate(clustered_listings().filter(ranges), precision))
+            ListingGridCell.objects.filter(precision=precision, geohash__in=chunk).exclude(
+                geohash__in=[row['cell'] for row in rows]
+            ).delete()
+            _save_cells(precision, rows)
+
+
+def rebuild_grid():
+    """Recompute every grid cell from scratch."""
+    with transaction.atomic():
+        ListingGridCell.objects.all().delete()
+        for precision in CLUSTER_PRECISIONS:
+            _save_cells(precision, _aggregate(clustered_listings(), precision).iterator())
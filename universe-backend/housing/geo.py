@@ -0,0 +1,108 @@
+# housing/geo.py
+import math
+
+from django.db.models import Q
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+# Upper bound on geohash cells (OR-ed index ranges) used to cover one query box
+MAX_COVER_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash; nearby points share long prefixes."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def listing_geohash(latitude, longitude):
+    if latitude is None or longitude is None:
+        return ''
+    return encode_geohash(latitude, longitude)
+
+
+def cell_size(precision):
+    """``(height, width)`` in degrees of a geohash cell at ``precision``."""
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_prefixes(min_lat, min_lng, max_lat, max_lng):
+    """
+    The geohash prefixes of the finest precision whose cells cover the box
+    in at most MAX_COVER_CELLS cells. The box is clamped to valid
+    coordinates; one too large for any precision is covered by the empty
+    prefix, which matches every geohash.
+    """
+    min_lat, max_lat = max(-90.0, min_lat), min(90.0, max_lat)
+    min_lng, max_lng = max(-180.0, min_lng), min(180.0, max_lng)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        first_row, last_row = math.floor(min_lat / height), math.floor(max_lat / height)
+        first_column, last_column = math.floor(min_lng / width), math.floor(max_lng / width)
+        if (last_row - first_row + 1) * (last_column - first_column + 1) <= MAX_COVER_CELLS:
+            break
+    else:
+        return ['']
+
+    # Encode each touched cell's centre; indices rather than float steps keep the walk exact
+    prefixes = set()
+    for row in range(first_row, last_row + 1):
+        lat = max(-90.0, min(90.0, (row + 0.5) * height))
+        for column in range(first_column, last_column + 1):
+            lng = max(-180.0, min(180.0, (column + 0.5) * width))
+            prefixes.add(encode_geohash(lat, lng, precision))
+    return sorted(prefixes)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """``(min_lat, min_lng, max_lat, max_lng)`` enclosing a circle."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    lng_delta = 180.0 if cos_lat < 1e-9 else min(180.0, lat_delta / cos_lat)
+    return (
+        max(-90.0, latitude - lat_delta), max(-180.0, longitude - lng_delta),
+        min(90.0, latitude + lat_delta), min(180.0, longitude + lng_delta),
+    )
+
+
+def box_filter(min_lat, min_lng, max_lat, max_lng, precision=None):
+    """
+    Geohash index ranges covering the box, narrowed by the exact coordinate
+    bounds. Ranges are ``>= prefix`` and ``< prefix + '~'`` so the geohash
+    index serves them; '~' sorts after every geohash character. Prefixes are
+    cut to ``precision`` when the rows hold shorter geohashes.
+    """
+    prefixes = covering_prefixes(min_lat, min_lng, max_lat, max_lng)
+    if precision is not None:
+        prefixes = sorted({prefix[:precision] for prefix in prefixes})
+    cells = Q()
+    for prefix in prefixes:
+        cells |= Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+    return cells & Q(
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lng, longitude__lte=max_lng,
+    )
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,306 @@
+# housing/importers.py
+import codecs
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .clusters import rebuild_grid, refresh_cells
+from .geo import listing_geohash
+from .models import HousingListing
+
+BRIDGE_URL = "https://api.bridgedataoutput.com/api/v2/test/listings"
+BRIDGE_SOURCE = 'bridge_api'
+PARTNER_SOURCE = 'partner'
+SOURCE_TITLES = {BRIDGE_SOURCE: "Bridge Listing", PARTNER_SOURCE: "Partner Listing"}
+PAGE_SIZE = 200
+BATCH_SIZE = 500
+# Past this many touched locations one grid rebuild beats per-cell refreshes
+GRID_REBUILD_THRESHOLD = 1000
+# Fields written from the feed; content_hash covers exactly these
+FEED_FIELDS = [
+    'title', 'address', 'city', 'description', 'price', 'bedrooms', 'bathrooms', 'square_feet',
+    'is_furnished', 'has_wifi', 'amenities', 'latitude', 'longitude',
+]
+READ_CHUNK = 64 * 1024
+# Leaves room in external_id for the partner prefix
+MAX_LISTING_ID = 40
+# What a malformed feed or entry raises from parsing or bulk writes
+FEED_ERRORS = (ValueError, TypeError, ArithmeticError, ValidationError)
+AMENITY_KEYS = ["FireplaceFeatures", "Appliances", "ExteriorFeatures", "AccessibilityFeatures"]
+
+
+def bridge_token():
+    return getattr(settings, 'BRIDGE_ACCESS_TOKEN', "6baca547742c6f96a6ff71b138424f21")
+
+
+def make_session(workers):
+    """A session whose connection pool is big enough for ``workers`` concurrent requests."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_pages(session, url, token, page_size=PAGE_SIZE, workers=4, timeout=30):
+    """
+    Yield the feed's pages (lists of entries) in order. ``workers`` pages
+    are requested at a time and paging stops after the first short page.
+    """
+    def fetch(offset):
+        response = session.get(
+            url, params={"access_token": token, "limit": page_size, "offset": offset}, timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json().get("bundle", [])
+
+    offsets = (page * page_size for page in count())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            pages = list(pool.map(fetch, islice(offsets, workers)))
+            for page in pages:
+                if page:
+                    yield page
+                if len(page) < page_size:
+                    return
+
+
+class _JsonStream:
+    """Just enough of a pull parser to walk a JSON document read in chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buffer, self.pos, self.eof = '', 0, False
+        # Characters dropped from the front of the buffer, for error offsets
+        self.consumed = 0
+
+    def fill(self):
+        """Append the next chunk to the buffer; False once the input is exhausted."""
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                chunk = self.text.decode(chunk)
+            if chunk:
+                self.consumed += self.pos
+                self.buffer = self.buffer[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def peek(self):
+        """The next non-whitespace character, or '' at the end of input."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at feed offset {self.consumed + self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decode one JSON value, reading more input until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as exc:
+                if self.eof or not self.fill():
+                    raise ValueError(f"{exc.msg} (feed offset {self.consumed + exc.pos})") from None
+                continue
+            # A number or literal may continue in the next chunk until a delimiter follows it
+            complete = self.buffer[self.pos] in '{["' or self.buffer[end:end + 1] in tuple(' \t\r\n,]}:')
+            if not complete and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_feed_entries(chunks, key='bundle'):
+    """
+    Yield the entries of a JSON feed read from an iterable of byte or text
+    chunks, without holding the whole document. The feed is either an
+    array of entries or an object with the array under ``key`` (as in a
+    Bridge API response).
+    """
+    stream = _JsonStream(chunks)
+    wrapped = stream.peek() == '{'
+    if wrapped:
+        stream.expect('{')
+        while True:
+            if stream.peek() == '}':
+                raise ValueError(f"Feed object has no {key!r} array")
+            name = stream.value()
+            stream.expect(':')
+            if name == key:
+                break
+            stream.value()
+            if stream.peek() != '}':
+                stream.expect(',')
+
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.expect(']')
+    else:
+        while True:
+            yield stream.value()
+            if stream.peek() != ',':
+                stream.expect(']')
+                break
+            stream.expect(',')
+
+    # Read the rest too, so a truncated or corrupt document is an error
+    if wrapped:
+        while stream.peek() == ',':
+            stream.expect(',')
+            stream.value()
+            stream.expect(':')
+            stream.value()
+        stream.expect('}')
+    if stream.peek():
+        raise ValueError(f"Unexpected data after the feed at offset {stream.consumed + stream.pos}")
+
+
+def read_chunks(fh, size=READ_CHUNK):
+    return iter(lambda: fh.read(size), b'')
+
+
+def map_entry(entry, source=BRIDGE_SOURCE):
+    """HousingListing field values for a feed entry, or None without a ListingId."""
+    if not isinstance(entry, dict):
+        return None
+    listing_id = entry.get('ListingId')
+    if not listing_id or len(str(listing_id)) > MAX_LISTING_ID:
+        return None
+    # Partner uploads are untrusted, so nested values are type-checked rather than assumed
+    amenities = []
+    for key in AMENITY_KEYS:
+        features = entry.get(key)
+        if isinstance(features, list):
+            amenities.extend(feature for feature in features if isinstance(feature, str))
+    image_url = None
+    media = entry.get("Media")
+    if isinstance(media, list) and media and isinstance(media[0], dict):
+        url = media[0].get("MediaURL")
+        image_url = url if isinstance(url, str) else None
+
+    return {
+        'external_id': str(listing_id),
+        'title': f"{SOURCE_TITLES[source]} #{listing_id}",
+        'address': entry.get("City", "San Jose"),
+        'city': "San Jose",
+        'description': entry.get("PublicRemarks", "Imported from Bridge API"),
+        'price': entry.get("ListPrice", 0),
+        'bedrooms': entry.get("BedroomsTotal", 1),
+        'bathrooms': entry.get("BathroomsTotalInteger", 1),
+        'square_feet': entry.get("LivingArea"),
+        'is_furnished': False,
+        'has_wifi': True,
+        'amenities': ", ".join(amenities),
+        'latitude': entry.get("Latitude"),
+        'longitude': entry.get("Longitude"),
+        'image': image_url,
+    }
+
+
+def content_hash(fields):
+    payload = json.dumps([fields[name] for name in FEED_FIELDS], default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _upsert_batch(rows, user, source, stats):
+    """Create new listings and update changed ones in one transaction; returns touched geohashes."""
+    existing = {
+        listing.external_id: listing
+        for listing in HousingListing.objects.filter(external_id__in=list(rows)).only(
+            'id', 'external_id', 'content_hash', 'geohash', 'image'
+        )
+    }
+    created, updated, geohashes = [], [], set()
+    for external_id, fields in rows.items():
+        digest = content_hash(fields)
+        geohash = listing_geohash(fields['latitude'], fields['longitude'])
+        listing = existing.get(external_id)
+        if listing is None:
+            created.append(HousingListing(
+                external_id=external_id, posted_by=user, source=source,
+                content_hash=digest, geohash=geohash, **fields
+            ))
+            geohashes.add(geohash)
+        elif listing.content_hash != digest:
+            geohashes.update((listing.geohash, geohash))
+            for name in FEED_FIELDS:
+                setattr(listing, name, fields[name])
+            if not listing.image and fields['image']:
+                listing.image = fields['image']
+            listing.content_hash, listing.geohash = digest, geohash
+            updated.append(listing)
+        else:
+            stats['unchanged'] += 1
+
+    # bulk_create/bulk_update skip save() and signals, so geohash is set above
+    # and the map grid is refreshed by the caller
+    with transaction.atomic():
+        HousingListing.objects.bulk_create(created)
+        HousingListing.objects.bulk_update(updated, FEED_FIELDS + ['image', 'content_hash', 'geohash'])
+    stats['created'] += len(created)
+    stats['updated'] += len(updated)
+    return geohashes
+
+
+def import_entries(entries, user, batch_size=BATCH_SIZE, source=BRIDGE_SOURCE, stats=None):
+    """
+    Upsert feed ``entries`` keyed on external_id, ``batch_size`` at a time,
+    touching only listings whose content hash changed. ``entries`` may be
+    a lazy iterator; at most one batch is held in memory. Partner ids are
+    namespaced by the uploading user. Counts go into ``stats``, which stays
+    accurate for the batches already saved if the feed turns out to be
+    malformed part way.
+    """
+    stats = stats if stats is not None else {}
+    for name in ('created', 'updated', 'unchanged', 'skipped'):
+        stats.setdefault(name, 0)
+    id_prefix = '' if source == BRIDGE_SOURCE else f"{source}:{user.pk}:"
+    geohashes, rebuild = set(), False
+    rows = {}
+
+    def flush():
+        nonlocal geohashes, rebuild
+        touched = _upsert_batch(rows, user, source, stats)
+        rows.clear()
+        if not rebuild:
+            geohashes |= touched
+            # Stop collecting locations once a rebuild is cheaper anyway
+            if len(geohashes) > GRID_REBUILD_THRESHOLD:
+                geohashes, rebuild = set(), True
+
+    try:
+        for entry in entries:
+            fields = map_entry(entry, source)
+            if fields is None:
+                stats['skipped'] += 1
+                continue
+            rows[id_prefix + fields.pop('external_id')] = fields
+            if len(rows) >= batch_size:
+                flush()
+        if rows:
+            flush()
+    finally:
+        if rebuild:
+            rebuild_grid()
+        else:
+            refresh_cells(geohashes)
+    return stats
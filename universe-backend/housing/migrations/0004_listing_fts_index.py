@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:31
+
+from django.db import migrations
+
+TABLE = 'housing_listing_fts'
+COLUMNS = 'title, description, city, address'
+NEW = 'new.title, new.description, new.city, new.address'
+OLD = 'old.title, old.description, old.city, old.address'
+
+CREATE = [
+    # External-content table: the index stores only tokens, rows stay in housing_housinglisting
+    f"""CREATE VIRTUAL TABLE {TABLE} USING fts5(
+        {COLUMNS},
+        content='housing_housinglisting', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER {TABLE}_ai AFTER INSERT ON housing_housinglisting BEGIN
+        INSERT INTO {TABLE}(rowid, {COLUMNS}) VALUES (new.id, {NEW});
+    END""",
+    f"""CREATE TRIGGER {TABLE}_ad AFTER DELETE ON housing_housinglisting BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD});
+    END""",
+    f"""CREATE TRIGGER {TABLE}_au AFTER UPDATE OF {COLUMNS} ON housing_housinglisting BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD});
+        INSERT INTO {TABLE}(rowid, {COLUMNS}) VALUES (new.id, {NEW});
+    END""",
+    f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')",
+]
+
+DROP = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLE}_au",
+    f"DROP TABLE IF EXISTS {TABLE}",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # Other databases keep the icontains search in housing/search.py
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0003_housinglisting_is_sold'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
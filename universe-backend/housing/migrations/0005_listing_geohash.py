@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+from housing.geo import encode_geohash
+
+
+def fill_geohashes(apps, schema_editor):
+    HousingListing = apps.get_model('housing', 'HousingListing')
+    listings = list(HousingListing.objects.filter(latitude__isnull=False, longitude__isnull=False).only(
+        'id', 'latitude', 'longitude'
+    ))
+    for listing in listings:
+        listing.geohash = encode_geohash(listing.latitude, listing.longitude)
+    HousingListing.objects.bulk_update(listings, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0004_listing_fts_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='housinglisting',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
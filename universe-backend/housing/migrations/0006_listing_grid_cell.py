@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Substr
+
+
+def build_grid(apps, schema_editor):
+    HousingListing = apps.get_model('housing', 'HousingListing')
+    ListingGridCell = apps.get_model('housing', 'ListingGridCell')
+    listings = HousingListing.objects.filter(is_sold=False).exclude(geohash='')
+    for precision in range(1, 8):
+        rows = listings.annotate(cell=Substr('geohash', 1, precision)).values('cell').annotate(
+            count=Count('id'), latitude=Avg('latitude'), longitude=Avg('longitude'),
+            min_price=Min('price'), max_price=Max('price'),
+        ).order_by()
+        ListingGridCell.objects.bulk_create([
+            ListingGridCell(precision=precision, geohash=row.pop('cell'), **row) for row in rows
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0005_listing_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingGridCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('geohash', models.CharField(max_length=12)),
+                ('count', models.PositiveIntegerField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=8)),
+            ],
+            options={
+                'unique_together': {('precision', 'geohash')},
+            },
+        ),
+        migrations.RunPython(build_grid, migrations.RunPython.noop),
+    ]
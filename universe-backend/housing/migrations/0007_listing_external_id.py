@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+BRIDGE_TITLE_PREFIX = 'Bridge Listing #'
+
+
+def fill_external_ids(apps, schema_editor):
+    # Older imports only recorded the feed id in the title; the oldest row wins a duplicate
+    HousingListing = apps.get_model('housing', 'HousingListing')
+    listings, seen = [], set()
+    rows = HousingListing.objects.filter(source='bridge_api', title__startswith=BRIDGE_TITLE_PREFIX).order_by('id')
+    for listing in rows.only('id', 'title'):
+        external_id = listing.title[len(BRIDGE_TITLE_PREFIX):].strip()
+        if external_id and external_id != 'N/A' and external_id not in seen:
+            seen.add(external_id)
+            listing.external_id = external_id
+            listings.append(listing)
+    HousingListing.objects.bulk_update(listings, ['external_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0006_listing_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='housinglisting',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='housinglisting',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_external_ids, migrations.RunPython.noop),
+    ]
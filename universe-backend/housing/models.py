@@ -1,6 +1,7 @@
 # Create your models here.
 from django.db import models
 from django.contrib.auth.models import User
+from .geo import listing_geohash
 
 class HousingListing(models.Model):
     title = models.CharField(max_length=100)
@@ -17,15 +18,44 @@ class HousingListing(models.Model):
     image = models.ImageField(upload_to='housing_images/', null=True, blank=True)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # Derived from latitude/longitude in save(); backs radius and bounding-box search
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     average_rating = models.FloatField(default=0.0)
     posted_by = models.ForeignKey(User, on_delete=models.CASCADE)
     source = models.CharField(max_length=20, default='user')  # user or external or bridge_api
+    # Feed listing id and hash of the mapped fields, set by housing.importers
+    external_id = models.CharField(max_length=64, null=True, blank=True, unique=True)
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
     posted_date = models.DateTimeField(auto_now_add=True)
     is_sold = models.BooleanField(default=False)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.geohash = listing_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+class ListingGridCell(models.Model):
+    """Unsold listings aggregated per geohash cell, one level per cluster precision."""
+    precision = models.PositiveSmallIntegerField()
+    geohash = models.CharField(max_length=12)
+    count = models.PositiveIntegerField()
+    # Centroid of the listings in the cell
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    min_price = models.DecimalField(max_digits=8, decimal_places=2)
+    max_price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        unique_together = ('precision', 'geohash')
+
+    def __str__(self):
+        return f"{self.geohash} ({self.count})"
+
 class HousingMessage(models.Model):
     item = models.ForeignKey(HousingListing, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_housing_messages')
@@ -0,0 +1,89 @@
+# housing/search.py
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'housing_listing_fts'
+SEARCH_COLUMNS = ('title', 'description', 'city', 'address')
+# BM25 column weights, in SEARCH_COLUMNS order: a title hit outranks a description hit
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0, 3.0)
+
+
+def fts_enabled():
+    """The FTS5 index only exists on SQLite (see migration 0004)."""
+    return connection.vendor == 'sqlite'
+
+
+def restore_fts_triggers(using='default'):
+    """
+    Recreate the FTS sync triggers from migration 0004 if they are gone.
+    SQLite drops a table's triggers when Django rebuilds the table for an
+    AlterField/AddField, so this runs after every migrate.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return False
+    columns = ', '.join(SEARCH_COLUMNS)
+    new = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    triggers = {
+        f'{FTS_TABLE}_ai': f"""AFTER INSERT ON housing_housinglisting BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new});
+        END""",
+        f'{FTS_TABLE}_ad': f"""AFTER DELETE ON housing_housinglisting BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old});
+        END""",
+        f'{FTS_TABLE}_au': f"""AFTER UPDATE OF {columns} ON housing_housinglisting BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old});
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new});
+        END""",
+    }
+    with db.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = %s AND type = 'table'", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'housing_housinglisting'")
+        missing = set(triggers) - {name for name, in cursor.fetchall()}
+        for name in sorted(missing):
+            cursor.execute(f'CREATE TRIGGER {name} {triggers[name]}')
+        if missing:
+            # Rows written while the triggers were missing are not indexed yet
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return bool(missing)
+
+
+def match_expression(search):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix,
+    in any indexed column. Words are quoted so user input can never be
+    read as FTS5 syntax.
+    """
+    terms = re.findall(r'\w+', search.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_listings(queryset, search):
+    """Filter ``queryset`` to listings matching ``search``, best match first."""
+    if not fts_enabled():
+        return queryset.filter(
+            Q(title__icontains=search) |
+            Q(description__icontains=search) |
+            Q(city__icontains=search) |
+            Q(address__icontains=search)
+        )
+
+    expression = match_expression(search)
+    if not expression:
+        return queryset.none()
+
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE} MATCH %s', f'{FTS_TABLE}.rowid = housing_housinglisting.id'],
+        params=[expression],
+    ).annotate(
+        # bm25() is lower for better matches
+        search_rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', ()),
+    ).order_by('search_rank', '-posted_date')
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import HousingListing, HousingMessage, HousingImage
+from .models import HousingListing, HousingMessage, HousingImage, ListingGridCell
 
 from .models import HousingListing, HousingImage
 from rest_framework import serializers
@@ -11,8 +11,16 @@ class HousingImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
 
 
+class ListingGridCellSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ListingGridCell
+        fields = ['geohash', 'count', 'latitude', 'longitude', 'min_price', 'max_price']
+
+
 class HousingListingSerializer(serializers.ModelSerializer):
     images = HousingImageSerializer(many=True, read_only=True)
+    # Set by HousingListingViewSet.list for ?near= searches only
+    distance_km = serializers.FloatField(read_only=True)
 
     class Meta:
         model = HousingListing
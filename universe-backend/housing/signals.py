@@ -0,0 +1,38 @@
+# housing/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save
+from django.dispatch import receiver
+
+from .clusters import refresh_cells
+from .models import HousingListing
+from .search import restore_fts_triggers
+
+
+def _cluster_state(instance):
+    return instance.__dict__.get('geohash'), instance.__dict__.get('price'), instance.__dict__.get('is_sold')
+
+
+@receiver(post_init, sender=HousingListing)
+def remember_cluster_state(sender, instance, **kwargs):
+    instance._cluster_snapshot = _cluster_state(instance)
+
+
+@receiver(post_save, sender=HousingListing)
+def refresh_listing_cells(sender, instance, created, **kwargs):
+    state = _cluster_state(instance)
+    if created or state != instance._cluster_snapshot:
+        geohashes = {instance._cluster_snapshot[0], state[0]}
+        transaction.on_commit(lambda: refresh_cells(geohashes))
+    instance._cluster_snapshot = state
+
+
+@receiver(post_delete, sender=HousingListing)
+def refresh_deleted_listing_cells(sender, instance, **kwargs):
+    geohashes = {instance._cluster_snapshot[0], instance.geohash}
+    transaction.on_commit(lambda: refresh_cells(geohashes))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == 'housing':
+        restore_fts_triggers(using)
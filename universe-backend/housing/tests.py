@@ -1,3 +1,170 @@
-from django.test import TestCase
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .importers import FEED_ERRORS, PARTNER_SOURCE, iter_feed_entries, map_entry
+from .models import HousingListing
+
+
+def bridge_entry(number, price=1000):
+    return {
+        'ListingId': f'B{number}',
+        'City': 'Santa Clara',
+        'PublicRemarks': f'Listing {number}',
+        'ListPrice': price + number,
+        'Latitude': 37.3 + number / 1000,
+        'Longitude': -121.9,
+        'Appliances': ['Oven'],
+        'Media': [{'MediaURL': f'http://images.example/{number}.jpg'}],
+    }
+
+
+def chunked(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class FeedParserTests(SimpleTestCase):
+    entries = [
+        # json.dumps escapes these, so the feed carries \u escapes and a surrogate pair
+        {'ListingId': 'B1', 'PublicRemarks': 'Quote " slash \\ tab \t café 🏠 ☃', 'ListPrice': -1.5e10},
+        {'ListingId': 'B2', 'Media': [{'MediaURL': 'http://images.example/2.jpg', 'Tags': [[], {}, [1, [2]]]}]},
+        {'ListingId': 'B3', 'LivingArea': 1234567890123, 'Latitude': 0.000125, 'Flags': [True, False, None]},
+        [],
+        'résumé 🏠',
+        0,
+    ]
+
+    def document(self):
+        bundle = json.dumps(self.entries)
+        return '{"total": {"count": [1, {"bundle": []}]}, "note": "[bundle]", "bundle": %s, "after": null}' % bundle
+
+    def test_every_chunk_boundary(self):
+        text = self.document()
+        data = text.encode()
+        for size in range(1, 24):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_feed_entries(chunked(data, size))), self.entries)
+                self.assertEqual(list(iter_feed_entries(chunked(text, size))), self.entries)
+
+    def test_plain_array_of_raw_utf8(self):
+        # Multi-byte characters split between chunks
+        data = json.dumps(self.entries, ensure_ascii=False).encode()
+        for size in range(1, 6):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_feed_entries(chunked(data, size))), self.entries)
+        self.assertEqual(list(iter_feed_entries([b' [ ] '])), [])
+        self.assertEqual(list(iter_feed_entries([b'{"bundle": []}'])), [])
+
+    def test_truncated_input(self):
+        data = self.document().encode()
+        for end in range(len(data)):
+            with self.subTest(end=end), self.assertRaises(FEED_ERRORS):
+                list(iter_feed_entries(chunked(data[:end], 7)))
+
+    def test_malformed_input(self):
+        for document in [
+            b'{"total": 1}', b'{"bundle": {}}', b'{"bundle" []}', b'{"bundle": [1 2]}', b'[1,]', b'[,1]',
+            b'["unterminated]', b'[01]', b'[tru]', b'[1] [2]x', b'"bundle"', b'\xff[1]', b'[1.5.2]',
+        ]:
+            with self.subTest(document=document), self.assertRaises(FEED_ERRORS):
+                list(iter_feed_entries(chunked(document, 2)))
+
+    def test_map_entry_type_checks(self):
+        fields = map_entry({
+            'ListingId': 'P1',
+            'Appliances': ['Oven', 3, None, {'name': 'Dryer'}, 'Washer'],
+            'FireplaceFeatures': 'Gas',
+            'Media': ['http://images.example/1.jpg'],
+        }, PARTNER_SOURCE)
+        self.assertEqual(fields['amenities'], 'Oven, Washer')
+        self.assertIsNone(fields['image'])
+        self.assertEqual(fields['title'], 'Partner Listing #P1')
+
+        for media in [[], {'MediaURL': 'x'}, [{'MediaURL': 5}], [{'MediaURL': ['x']}], None]:
+            with self.subTest(media=media):
+                self.assertIsNone(map_entry({'ListingId': 'P1', 'Media': media})['image'])
+        self.assertEqual(map_entry({'ListingId': 'P1', 'Media': [{'MediaURL': 'u'}, 5]})['image'], 'u')
+
+        for entry in [[], 'B1', None, {}, {'ListingId': ''}, {'ListingId': 'x' * 41}]:
+            with self.subTest(entry=entry):
+                self.assertIsNone(map_entry(entry))
+
+
+class BridgeFeedHandler(BaseHTTPRequestHandler):
+    """Serves ``server.feed`` the way the Bridge API pages it, by limit and offset."""
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        offset, limit = int(query['offset'][0]), int(query['limit'][0])
+        self.server.requests.append(offset)
+        body = json.dumps({'bundle': self.server.feed[offset:offset + limit]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImportBridgeHousingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), BridgeFeedHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}/listings'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        # 130 entries plus one without a ListingId, served 50 per page
+        self.server.feed = [bridge_entry(number) for number in range(130)] + [{'City': 'San Jose'}]
+        self.server.requests.clear()
+
+    def run_import(self):
+        out = StringIO()
+        call_command('import_bridge_housing', base_url=self.base_url, page_size=50, workers=2, stdout=out)
+        return out.getvalue()
+
+    def test_imports_every_page(self):
+        output = self.run_import()
+
+        self.assertIn('130 created, 0 updated, 0 unchanged, 1 skipped', output)
+        self.assertEqual(sorted(self.server.requests), [0, 50, 100, 150])
+        listing = HousingListing.objects.get(external_id='B7')
+        self.assertEqual(listing.title, 'Bridge Listing #B7')
+        self.assertEqual(listing.image.name, 'http://images.example/7.jpg')
+        self.assertNotEqual(listing.geohash, '')
+
+    def test_rerun_writes_only_changed_rows(self):
+        self.run_import()
+        hashes = dict(HousingListing.objects.values_list('external_id', 'content_hash'))
+        self.server.feed[7] = bridge_entry(7, price=2000)
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_import()
+
+        self.assertIn('0 created, 1 updated, 129 unchanged, 1 skipped', output)
+        self.assertEqual(HousingListing.objects.get(external_id='B7').price, 2007)
+        changed = {
+            external_id for external_id, content_hash in HousingListing.objects.values_list('external_id', 'content_hash')
+            if hashes[external_id] != content_hash
+        }
+        self.assertEqual(changed, {'B7'})
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "housing_housinglisting"')]
+        self.assertEqual(len(updates), 1)
+        self.assertLessEqual(len(queries), 30)
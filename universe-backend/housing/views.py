@@ -1,10 +1,17 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
-from .models import HousingListing, HousingMessage, HousingImage
-from .serializers import HousingListingSerializer, HousingMessageSerializer, HousingImageSerializer
+from .models import HousingListing, HousingMessage, HousingImage, ListingGridCell
+from .clusters import precision_for_zoom
+from .importers import FEED_ERRORS, PARTNER_SOURCE, import_entries, iter_feed_entries, read_chunks
+from .geo import bounding_box, box_filter, haversine_km
+from .search import search_listings
+from .serializers import (
+    HousingListingSerializer, HousingMessageSerializer, HousingImageSerializer, ListingGridCellSerializer,
+)
 
 
 class HousingImageViewSet(viewsets.ModelViewSet):
@@ -17,12 +24,17 @@ class HousingImageViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You cannot delete this image.")
         instance.delete()
         
+DEFAULT_RADIUS_KM = 2
+MAX_RADIUS_KM = 100
+MAX_ZOOM = 22
+
+
 class HousingListingViewSet(viewsets.ModelViewSet):
     queryset = HousingListing.objects.all()
     serializer_class = HousingListingSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'city', 'address']
+    # ?search= is handled by get_queryset through the full-text index
+    filter_backends = [filters.OrderingFilter]
     ordering_fields = ['price', 'posted_date', 'average_rating']
 
     def get_queryset(self):
@@ -30,12 +42,7 @@ class HousingListingViewSet(viewsets.ModelViewSet):
         params = self.request.query_params
 
         if (search := params.get('search')):
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(city__icontains=search) |
-                Q(address__icontains=search)
-            )
+            queryset = search_listings(queryset, search)
         is_sold = params.get('is_sold')
         if is_sold is not None:
             if is_sold.lower() == 'true':
@@ -43,6 +50,12 @@ class HousingListingViewSet(viewsets.ModelViewSet):
             elif is_sold.lower() == 'false':
                 queryset = queryset.filter(is_sold=False)
 
+        if (near := params.get('near')):
+            latitude, longitude, radius_km = self._near_params(near, params.get('radius_km'))
+            queryset = queryset.filter(box_filter(*bounding_box(latitude, longitude, radius_km)))
+        elif (bbox := params.get('bbox')):
+            queryset = queryset.filter(box_filter(*self._bbox_params(bbox)))
+
         if (city := params.get('city')):
             queryset = queryset.filter(city__icontains=city.strip())
 
@@ -67,6 +80,100 @@ class HousingListingViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        With ``?near=lat,lng&radius_km=`` the index pre-filter from
+        get_queryset is refined by exact distance, and results come back
+        nearest first unless another ``?ordering=`` is given.
+        """
+        near = request.query_params.get('near')
+        if not near:
+            return super().list(request, *args, **kwargs)
+
+        latitude, longitude, radius_km = self._near_params(near, request.query_params.get('radius_km'))
+        listings = []
+        for listing in self.filter_queryset(self.get_queryset()):
+            distance = haversine_km(latitude, longitude, listing.latitude, listing.longitude)
+            if distance <= radius_km:
+                listing.distance_km = round(distance, 3)
+                listings.append(listing)
+        if request.query_params.get('ordering', 'distance') in ('distance', 'distance_km'):
+            listings.sort(key=lambda listing: listing.distance_km)
+
+        serializer = self.get_serializer(listings, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """
+        Map clusters for ``?bbox=min_lng,min_lat,max_lng,max_lat&zoom=``,
+        read from the precomputed ListingGridCell level that suits the zoom.
+        Covers unsold listings with coordinates; other list filters do not apply.
+        """
+        bbox = self._bbox_params(request.query_params.get('bbox', ''))
+        try:
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            raise ValidationError({'zoom': 'Expected an integer map zoom level.'})
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValidationError({'zoom': f'Zoom must be between 0 and {MAX_ZOOM}.'})
+
+        precision = precision_for_zoom(zoom)
+        cells = ListingGridCell.objects.filter(box_filter(*bbox, precision=precision), precision=precision)
+        return Response({
+            'precision': precision,
+            'clusters': ListingGridCellSerializer(cells, many=True).data,
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-upload')
+    def bulk_upload(self, request):
+        """
+        Partner feed upload: a Bridge-style JSON feed (an array of entries or
+        an object with a ``bundle`` array) as the raw request body or as a
+        multipart ``file``. The body is parsed as a stream and written in
+        batches, so its size does not bound memory.
+        """
+        if not request.user.has_perm('housing.add_housinglisting'):
+            return Response({'detail': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'Attach the feed as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+            chunks = upload.chunks()
+        else:
+            chunks = read_chunks(request.stream) if request.stream else []
+
+        stats = {}
+        try:
+            import_entries(iter_feed_entries(chunks), request.user, source=PARTNER_SOURCE, stats=stats)
+        except FEED_ERRORS as exc:
+            # Batches written before the error stay saved; stats count them
+            return Response({'error': f'Malformed feed: {exc}', **stats}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats)
+
+    def _bbox_params(self, bbox):
+        try:
+            min_lng, min_lat, max_lng, max_lat = map(float, bbox.split(','))
+        except ValueError:
+            raise ValidationError({'bbox': 'Expected min_lng,min_lat,max_lng,max_lat.'})
+        # NaN fails every comparison, so it is rejected here too
+        if not (-90 <= min_lat <= 90 and -90 <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise ValidationError({'bbox': 'Latitudes must be within [-90, 90] and longitudes within [-180, 180].'})
+        if min_lat > max_lat or min_lng > max_lng:
+            raise ValidationError({'bbox': 'Minimums must not exceed maximums.'})
+        return min_lat, min_lng, max_lat, max_lng
+
+    def _near_params(self, near, radius_km):
+        try:
+            latitude, longitude = map(float, near.split(','))
+            radius_km = float(radius_km or DEFAULT_RADIUS_KM)
+        except ValueError:
+            raise ValidationError({'near': 'Expected near=lat,lng and a numeric radius_km.'})
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not 0 < radius_km <= MAX_RADIUS_KM:
+            raise ValidationError({'near': f'Coordinates out of range or radius_km not in (0, {MAX_RADIUS_KM}].'})
+        return latitude, longitude, radius_km
+
     def perform_create(self, serializer):
         serializer.save()
 
@@ -0,0 +1,26 @@
+# roommate_matching/access.py
+from universe_backend.access_cache import access_cache
+from .models import MatchRequest
+
+
+def match_key(match_id):
+    return ('match', int(match_id))
+
+
+def _load_match(match_id):
+    return MatchRequest.objects.filter(id=match_id).values_list('sender_id', 'receiver_id', 'status').first()
+
+
+def match_access(match_id):
+    """Cached ``(sender_id, receiver_id, status)`` for a match request, or None."""
+    return access_cache.get_or_load(match_key(match_id), lambda: _load_match(match_id))
+
+
+async def amatch_access(match_id):
+    return await access_cache.aget_or_load(match_key(match_id), lambda: _load_match(match_id))
+
+
+def is_participant(access, user_id, status=None):
+    if access is None or user_id not in access[:2]:
+        return False
+    return status is None or access[2] == status
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RoommateMatchingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'roommate_matching'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,261 @@
+# roommate_matching/compatibility.py
+import heapq
+from decimal import Decimal
+from fractions import Fraction
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from user_profiles.models import RoommateProfile
+from .models import CompatibilityScore
+
+# (field, weight) pairs that score full points on an exact match
+CATEGORICAL_WEIGHTS = (
+    ('smoking_preference', 15),
+    ('drinking_preference', 10),
+    ('sleep_habits', 20),
+    ('study_habits', 15),
+    ('guests_preference', 10),
+)
+CATEGORICAL_FIELDS = tuple(field for field, _ in CATEGORICAL_WEIGHTS)
+CATEGORICAL_WEIGHT_ARRAY = np.array([weight for _, weight in CATEGORICAL_WEIGHTS], dtype=np.int64)
+
+CLEANLINESS_WEIGHT = 20
+CLEANLINESS_LADDER = {0: 1, 1: 0.7, 2: 0.4}
+
+BUDGET_WEIGHT = 10
+BUDGET_BANDS = ((0.1, 1), (0.2, 0.7), (0.3, 0.4))
+
+SCORED_FIELDS = CATEGORICAL_FIELDS + ('cleanliness_level', 'max_rent_budget')
+
+
+def calculate_compatibility(user_profile, other_profile):
+    """Score a single pair of roommate profiles on a 0-100 scale."""
+    score = 0
+    total_weight = 0
+
+    def add(weight, match):
+        nonlocal score, total_weight
+        total_weight += weight
+        if match: score += weight
+
+    for field, weight in CATEGORICAL_WEIGHTS:
+        add(weight, getattr(user_profile, field) == getattr(other_profile, field))
+
+    weight = CLEANLINESS_WEIGHT
+    diff = abs(user_profile.cleanliness_level - other_profile.cleanliness_level)
+    score += weight * CLEANLINESS_LADDER.get(diff, 0)
+    total_weight += weight
+
+    if user_profile.max_rent_budget and other_profile.max_rent_budget:
+        weight = BUDGET_WEIGHT
+        diff_pct = abs(user_profile.max_rent_budget - other_profile.max_rent_budget) / max(user_profile.max_rent_budget, other_profile.max_rent_budget)
+        score += weight * next((factor for limit, factor in BUDGET_BANDS if diff_pct <= limit), 0)
+        total_weight += weight
+
+    return round((score / total_weight) * 100, 1) if total_weight else 50.0
+
+
+class ProfileMatrix:
+    """
+    Column-oriented snapshot of roommate profiles for scoring many pairs at once.
+
+    Categorical preferences are stored as small integer codes so a whole
+    column can be compared against one profile in a single NumPy operation.
+    """
+
+    def __init__(self, user_ids, codes, cleanliness, budgets, vocabulary):
+        self.user_ids = user_ids
+        self.codes = codes
+        self.cleanliness = cleanliness
+        self.budgets = budgets
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        return cls.from_rows(queryset.values_list('user_profile__user_id', *SCORED_FIELDS))
+
+    @classmethod
+    def from_profiles(cls, profiles):
+        return cls.from_rows(
+            [(profile.user_profile.user_id, *(getattr(profile, field) for field in SCORED_FIELDS)) for profile in profiles]
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a matrix from ``(user_id, *SCORED_FIELDS)`` tuples."""
+        rows = list(rows)
+        vocabulary = [
+            {value: code for code, (value, _) in enumerate(RoommateProfile._meta.get_field(field).choices)}
+            for field in CATEGORICAL_FIELDS
+        ]
+        count = len(rows)
+        width = len(CATEGORICAL_FIELDS)
+
+        user_ids = np.empty(count, dtype=np.int64)
+        codes = np.empty((count, width), dtype=np.int16)
+        cleanliness = np.empty(count, dtype=np.int64)
+        budgets = np.empty(count, dtype=np.int64)
+        for i, row in enumerate(rows):
+            user_ids[i] = row[0]
+            codes[i] = [encode_choice(vocabulary[j], value) for j, value in enumerate(row[1:width + 1])]
+            cleanliness[i] = row[width + 1]
+            budgets[i] = budget_cents(row[width + 2])
+
+        return cls(user_ids, codes, cleanliness, budgets, vocabulary)
+
+    def encode(self, profile):
+        """Encode a single profile with this matrix's vocabulary."""
+        codes = np.array(
+            [encode_choice(self.vocabulary[j], getattr(profile, field)) for j, field in enumerate(CATEGORICAL_FIELDS)],
+            dtype=np.int16,
+        )
+        return codes, profile.cleanliness_level, budget_cents(profile.max_rent_budget)
+
+    def scores_for(self, profile):
+        """Score ``profile`` against every row, returning an array aligned with ``user_ids``."""
+        return self.score_encoded(*self.encode(profile))
+
+    def scores_for_row(self, index, rows=slice(None)):
+        """Score the profile stored at ``index`` against ``rows`` of this matrix."""
+        return self.score_encoded(
+            self.codes[index], self.cleanliness[index], self.budgets[index], rows=rows
+        )
+
+    def score_encoded(self, codes, cleanliness, budget, rows=slice(None)):
+        matches = (self.codes[rows] == codes) @ CATEGORICAL_WEIGHT_ARRAY
+
+        diff = np.abs(self.cleanliness[rows] - cleanliness)
+        ladder = np.zeros(diff.shape, dtype=np.float64)
+        for step, factor in CLEANLINESS_LADDER.items():
+            ladder[diff == step] = CLEANLINESS_WEIGHT * factor
+        score = matches + ladder
+        total_weight = np.full(score.shape, CATEGORICAL_WEIGHT_ARRAY.sum() + CLEANLINESS_WEIGHT, dtype=np.int64)
+
+        # A missing or zero budget on either side drops the budget band entirely.
+        # Budgets are whole cents so the bands can be checked without float error.
+        others = self.budgets[rows]
+        if budget:
+            valid = others != 0
+            diff = np.abs(others - budget)
+            highest = np.maximum(others, budget)
+            band = np.zeros(diff.shape, dtype=np.float64)
+            for (numerator, denominator, inclusive), (_, factor) in reversed(list(zip(_BAND_LIMITS, BUDGET_BANDS))):
+                lhs, rhs = diff * denominator, highest * numerator
+                band[(lhs <= rhs) if inclusive else (lhs < rhs)] = BUDGET_WEIGHT * factor
+            score = np.where(valid, score + band, score)
+            total_weight = total_weight + BUDGET_WEIGHT * valid
+
+        return np.round((score / total_weight) * 100, 1)
+
+
+def canonical_pair(user_id, other_id):
+    """Order a pair of user ids the way CompatibilityScore stores them."""
+    return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+
+def stored_scores(user_id):
+    """Map every other user id to its stored score with ``user_id``."""
+    rows = CompatibilityScore.objects.filter(
+        Q(user1_id=user_id) | Q(user2_id=user_id)
+    ).values_list('user1_id', 'user2_id', 'score')
+    return {user2 if user1 == user_id else user1: score for user1, user2, score in rows}
+
+
+def save_scores(user_id, scores, overwrite=True):
+    """
+    Upsert ``{other_user_id: score}`` for ``user_id`` in bulk.
+
+    With ``overwrite=False`` existing rows are left alone and only missing
+    pairs are inserted.
+    """
+    rows = [
+        CompatibilityScore(user1_id=user1, user2_id=user2, score=score)
+        for (user1, user2), score in (
+            (canonical_pair(user_id, other_id), score) for other_id, score in scores.items()
+        )
+    ]
+    if overwrite:
+        CompatibilityScore.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user1', 'user2'],
+            update_fields=['score', 'last_calculated'],
+        )
+    else:
+        CompatibilityScore.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def ranked_scores(user_id, limit, after=None, candidates=None):
+    """
+    Return up to ``limit`` ``(other_user_id, score)`` pairs for ``user_id``,
+    best score first and then by user id, starting past the ``after``
+    ``(score, other_user_id)`` position. ``candidates`` optionally restricts
+    the other users to a subquery of user ids.
+
+    Each half of the canonical pair is read through its own
+    ``(user, -score, other)`` index and the two sorted halves are merged.
+    """
+    halves = []
+    for column, other in (('user1_id', 'user2_id'), ('user2_id', 'user1_id')):
+        queryset = CompatibilityScore.objects.filter(**{column: user_id})
+        if after is not None:
+            score, other_id = after
+            queryset = queryset.filter(Q(score__lt=score) | Q(score=score, **{f'{other}__gt': other_id}))
+        if candidates is not None:
+            queryset = queryset.filter(**{f'{other}__in': candidates})
+        halves.append(queryset.order_by('-score', other).values_list(other, 'score')[:limit])
+    merged = heapq.merge(*halves, key=lambda row: (-row[1], row[0]))
+    return list(islice(merged, limit))
+
+
+def unscored_profiles(user_id):
+    """Roommate profiles of other users that have no stored score with ``user_id``."""
+    scored = CompatibilityScore.objects.filter(Q(user1_id=user_id) | Q(user2_id=user_id))
+    return RoommateProfile.objects.exclude(user_profile__user_id=user_id).exclude(
+        user_profile__user_id__in=scored.values('user1_id')
+    ).exclude(
+        user_profile__user_id__in=scored.values('user2_id')
+    )
+
+
+def backfill_scores(profile):
+    """Score ``profile`` against every candidate it has no stored score with yet."""
+    user_id = profile.user_profile.user_id
+    matrix = ProfileMatrix.from_queryset(unscored_profiles(user_id))
+    if len(matrix):
+        save_scores(user_id, dict(zip(matrix.user_ids.tolist(), matrix.scores_for(profile).tolist())), overwrite=False)
+
+
+def refresh_scores(profile):
+    """Recompute every stored score involving ``profile`` in bulk."""
+    matrix = ProfileMatrix.from_queryset(RoommateProfile.objects.exclude(pk=profile.pk))
+    scores = dict(zip(matrix.user_ids.tolist(), matrix.scores_for(profile).tolist()))
+    with transaction.atomic():
+        save_scores(profile.user_profile.user_id, scores)
+
+
+def budget_cents(budget):
+    # Zero doubles as "no budget", matching the truthiness check in the scalar rules
+    return int(budget * 100) if budget else 0
+
+
+def _band_limit(limit):
+    # The scalar rules compare a Decimal ratio against a float literal, so a
+    # ratio landing exactly on the written limit only counts when the float
+    # rounded upwards (0.1, 0.2) and not when it rounded down (0.3).
+    written = Fraction(Decimal(repr(limit)))
+    return written.numerator, written.denominator, Fraction(limit) >= written
+
+
+_BAND_LIMITS = [_band_limit(limit) for limit, _ in BUDGET_BANDS]
+
+
+def encode_choice(vocabulary, value):
+    # Values outside the model choices still need a stable, distinct code
+    return vocabulary.setdefault(value, len(vocabulary))
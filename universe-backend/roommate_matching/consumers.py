@@ -1,12 +1,66 @@
 # roommate_matching/consumers.py
+import asyncio
+from collections import Counter
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.layers import get_channel_layer
 import json
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from django.db.models import Q
-from .models import MatchRequest
+from django.db import transaction
+from universe_backend.write_behind import QueuePool, WriteBehindQueue
+from .access import amatch_access, is_participant
+from .models import MatchRequest, Message
+from .serializers import MessageSerializer
+
+def _save_messages(match_id, batch):
+    """Insert a batch of ``(sender, content)`` messages and bump the match once."""
+    with transaction.atomic():
+        messages = Message.objects.bulk_create(
+            [Message(match_request_id=match_id, sender=sender, content=content) for sender, content in batch]
+        )
+        MatchRequest.objects.filter(id=match_id).update(last_message_at=messages[-1].timestamp)
+    return MessageSerializer(messages, many=True).data
+
+
+def _chat_writer(room_group_name):
+    match_id = int(room_group_name.split('_')[2])
+
+    async def flush(batch):
+        payloads = await database_sync_to_async(_save_messages)(match_id, batch)
+        # Broadcast only what is durable, in insertion order
+        channel_layer = get_channel_layer()
+        for payload in payloads:
+            await channel_layer.group_send(room_group_name, {
+                'type': 'chat_message',
+                'message': payload,
+                'sender_id': str(payload['sender']['id'])
+            })
+        return payloads
+
+    return WriteBehindQueue(flush, max_batch=50, max_delay=0.02)
+
+
+# One write-behind queue per open chat room, shared by every connection to it
+chat_writers = QueuePool(_chat_writer)
+
+# Seconds without a typing frame before the peer is told typing stopped
+TYPING_TIMEOUT = 3
+
+# Typing frames received from clients, transitions emitted to peers, and
+# frames absorbed by the debounce, for this process
+typing_stats = Counter(received=0, emitted=0, suppressed=0)
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    writer = None
+    peer_id = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.persisting = set()
+        self.typing = False
+        self.typing_timer = None
+
     async def connect(self):
         if not self.scope["user"].is_authenticated:
             await self.close()
@@ -17,53 +71,119 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         # Verify user has access to this chat
         if await self.verify_match_access():
+            self.writer = chat_writers.acquire(self.room_group_name)
             await self.channel_layer.group_add(
                 self.room_group_name,
                 self.channel_name
             )
+            # Per-user group so typing events reach only the other participant
+            await self.channel_layer.group_add(
+                self.user_group_name(self.scope["user"].id),
+                self.channel_name
+            )
             await self.accept()
         else:
             await self.close()
 
-    @database_sync_to_async
-    def verify_match_access(self):
+    async def verify_match_access(self):
         try:
             match_id = int(self.room_name.split('_')[1])
-            return MatchRequest.objects.filter(
-                id=match_id,
-                status='accepted',
-            ).filter(
-                Q(sender=self.scope["user"]) | Q(receiver=self.scope["user"])
-            ).exists()
-        except:
+        except (IndexError, ValueError):
+            return False
+        access = await amatch_access(match_id)
+        if not is_participant(access, self.scope["user"].id, status='accepted'):
             return False
+        sender_id, receiver_id, _ = access
+        self.peer_id = receiver_id if sender_id == self.scope["user"].id else sender_id
+        return True
+
+    def user_group_name(self, user_id):
+        return f'{self.room_group_name}_u{user_id}'
+
+    async def persist_message(self, content):
+        try:
+            await self.writer.submit((self.scope["user"], content))
+        except Exception:
+            await self.send(text_data=json.dumps({
+                'type': 'chat_error',
+                'detail': 'Message could not be saved.'
+            }))
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        if self.writer is not None:
+            await self.stop_typing()
+            await chat_writers.release(self.room_group_name)
+            await asyncio.gather(*self.persisting, return_exceptions=True)
+            self.writer = None
+            await self.channel_layer.group_discard(
+                self.user_group_name(self.scope["user"].id),
+                self.channel_name
+            )
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
 
     async def receive(self, text_data):
         data = json.loads(text_data)
         
         if data['type'] == 'chat_message':
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'chat_message',
-                    'message': data['message'],
-                    'sender_id': str(self.scope["user"].id)
-                }
-            )
+            message = data['message']
+            if isinstance(message, dict) and message.get('id'):
+                # Already stored through the REST endpoint; just relay it
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    {
+                        'type': 'chat_message',
+                        'message': message,
+                        'sender_id': str(self.scope["user"].id)
+                    }
+                )
+                return
+            content = message.get('content') if isinstance(message, dict) else message
+            if not isinstance(content, str) or not content.strip():
+                return
+            await self.stop_typing()
+            # Queued in arrival order; the broadcast back to the sender is its ack
+            task = asyncio.ensure_future(self.persist_message(content))
+            self.persisting.add(task)
+            task.add_done_callback(self.persisting.discard)
         elif data['type'] == 'typing':
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'typing_indicator',
-                    'sender_id': str(self.scope["user"].id)
-                }
-            )
+            await self.start_typing()
+
+    async def start_typing(self):
+        """Forward only the start of a typing burst; later keypresses just push the timeout back."""
+        typing_stats['received'] += 1
+        if self.typing_timer is not None:
+            self.typing_timer.cancel()
+        self.typing_timer = asyncio.get_running_loop().call_later(
+            TYPING_TIMEOUT, lambda: asyncio.ensure_future(self.stop_typing())
+        )
+        if self.typing:
+            typing_stats['suppressed'] += 1
+            return
+        self.typing = True
+        await self.send_typing(True)
+
+    async def stop_typing(self):
+        if self.typing_timer is not None:
+            self.typing_timer.cancel()
+            self.typing_timer = None
+        if self.typing:
+            self.typing = False
+            await self.send_typing(False)
+
+    async def send_typing(self, typing):
+        typing_stats['emitted'] += 1
+        await self.channel_layer.group_send(
+            self.user_group_name(self.peer_id),
+            {
+                'type': 'typing_indicator',
+                'sender_id': str(self.scope["user"].id),
+                'typing': typing
+            }
+        )
 
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
@@ -75,5 +195,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def typing_indicator(self, event):
         if event['sender_id'] != str(self.scope["user"].id):
             await self.send(text_data=json.dumps({
-                'type': 'typing_indicator'
-            }))
\ No newline at end of file
+                'type': 'typing_indicator',
+                'typing': event.get('typing', True)
+            }))
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from roommate_matching.compatibility import ProfileMatrix
+from roommate_matching.pairing import pair_cohort
+from user_profiles.models import RoommateProfile
+
+
+class Command(BaseCommand):
+    help = 'Pair a cohort of roommate profiles to maximise total compatibility'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-ids', help='Comma-separated user ids (defaults to every roommate profile)')
+        parser.add_argument('--candidates', type=int, default=20, help='Best partners kept per student')
+        parser.add_argument('--passes', type=int, default=3, help='Local improvement passes')
+        parser.add_argument('--output', help='Write the pairing as JSON to this file')
+
+    def handle(self, *args, **options):
+        profiles = RoommateProfile.objects.order_by('user_profile__user_id')
+        if options['user_ids']:
+            user_ids = [int(user_id) for user_id in options['user_ids'].split(',') if user_id.strip()]
+            profiles = profiles.filter(user_profile__user_id__in=user_ids)
+        matrix = ProfileMatrix.from_queryset(profiles)
+
+        def progress(stage, done, total):
+            self.stdout.write(f"[{stage}] {done}/{total}")
+
+        pairs, unmatched, metrics = pair_cohort(
+            matrix, candidates=options['candidates'], passes=options['passes'], progress=progress
+        )
+
+        result = {
+            'pairs': [{'user1': user1, 'user2': user2, 'score': score} for user1, user2, score in pairs],
+            'unmatched': unmatched,
+            'metrics': metrics,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(result, fh, indent=2)
+
+        for key, value in metrics.items():
+            self.stdout.write(f"{key}: {value}")
+        self.stdout.write(self.style.SUCCESS(f"Paired {metrics['pairs'] * 2} of {metrics['students']} students."))
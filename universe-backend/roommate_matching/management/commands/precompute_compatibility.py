@@ -0,0 +1,129 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from roommate_matching.compatibility import ProfileMatrix
+from roommate_matching.models import CompatibilityScore
+from user_profiles.models import RoommateProfile
+
+# Set in each worker process by _init_worker so shards only ship row ranges
+_matrix = None
+
+
+def _init_worker(matrix):
+    global _matrix
+    _matrix = matrix
+
+
+def _score_shard(start, stop):
+    """Score rows ``start:stop`` against every later row (the upper triangle)."""
+    user1, user2, scores = [], [], []
+    for i in range(start, stop):
+        rest = slice(i + 1, None)
+        user1.append(np.full(len(_matrix) - i - 1, _matrix.user_ids[i], dtype=np.int64))
+        user2.append(_matrix.user_ids[rest])
+        scores.append(_matrix.scores_for_row(i, rows=rest))
+    if not user1:
+        return start, np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    return start, np.concatenate(user1), np.concatenate(user2), np.concatenate(scores)
+
+
+class Command(BaseCommand):
+    help = 'Precompute compatibility scores for every pair of roommate profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--shard-size', type=int, default=200, help='Profiles scored per shard')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per insert')
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, 'precompute_compatibility.checkpoint.json'),
+            help='File recording finished shards so an interrupted run can resume',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        # Ordering by user id makes every upper-triangle pair canonical (user1 < user2)
+        matrix = ProfileMatrix.from_queryset(RoommateProfile.objects.order_by('user_profile__user_id'))
+        total = len(matrix)
+        if total < 2:
+            self.stdout.write("Fewer than two roommate profiles, nothing to score.")
+            return
+
+        shard_size = max(1, options['shard_size'])
+        shards = [(start, min(start + shard_size, total - 1)) for start in range(0, total - 1, shard_size)]
+        fingerprint = hashlib.sha256(matrix.user_ids.tobytes()).hexdigest()
+        checkpoint = options['checkpoint']
+        done = set() if options['restart'] else self._load_checkpoint(checkpoint, fingerprint)
+        pending = [shard for shard in shards if shard[0] not in done]
+        if done:
+            self.stdout.write(f"Resuming: {len(done)}/{len(shards)} shards already scored.")
+
+        # Workers inherit the matrix through fork instead of re-importing Django
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        workers = max(1, options['workers'])
+        written = 0
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(matrix,)) as pool:
+            queue = iter(pending)
+            running = set()
+            while True:
+                # Keep a bounded number of shards in flight so results never pile up in memory
+                for start, stop in queue:
+                    running.add(pool.submit(_score_shard, start, stop))
+                    if len(running) >= workers * 2:
+                        break
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, user1, user2, scores = future.result()
+                    written += self._write(user1, user2, scores, options['batch_size'])
+                    done.add(start)
+                    self._save_checkpoint(checkpoint, fingerprint, done)
+                    self.stdout.write(f"Scored {len(done)}/{len(shards)} shards ({written} pairs this run)")
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f"Precomputed {written} compatibility scores for {total} profiles."))
+
+    def _write(self, user1, user2, scores, batch_size):
+        # Build model objects one batch at a time; a shard holds shard_size x N pairs
+        with transaction.atomic():
+            for offset in range(0, len(scores), batch_size):
+                batch = slice(offset, offset + batch_size)
+                CompatibilityScore.objects.bulk_create(
+                    [
+                        CompatibilityScore(user1_id=a, user2_id=b, score=score)
+                        for a, b, score in zip(user1[batch].tolist(), user2[batch].tolist(), scores[batch].tolist())
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['user1', 'user2'],
+                    update_fields=['score', 'last_calculated'],
+                )
+        return len(scores)
+
+    def _load_checkpoint(self, path, fingerprint):
+        try:
+            with open(path) as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return set()
+        # A checkpoint for a different set of profiles cannot be trusted
+        if state.get('fingerprint') != fingerprint:
+            return set()
+        return set(state.get('done', []))
+
+    def _save_checkpoint(self, path, fingerprint, done):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as fh:
+            json.dump({'fingerprint': fingerprint, 'done': sorted(done)}, fh)
+        os.replace(tmp_path, path)
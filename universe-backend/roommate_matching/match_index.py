@@ -0,0 +1,175 @@
+# roommate_matching/match_index.py
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from user_profiles.models import RoommateProfile
+from .compatibility import (
+    BUDGET_WEIGHT,
+    CATEGORICAL_WEIGHT_ARRAY,
+    CLEANLINESS_WEIGHT,
+    ProfileMatrix,
+)
+
+
+class BucketIndex:
+    """
+    In-process nearest-neighbour index over roommate profiles.
+
+    Each profile is embedded as its categorical preference codes plus its
+    cleanliness level and budget. The categorical codes quantize profiles
+    into buckets; a query visits buckets in order of the best score any
+    member could reach and scores bucket members exactly, stopping once no
+    remaining bucket can beat the current top-K. Stopping after ``probes``
+    buckets, once the top-K is full, trades recall for latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._size = 0
+        self._rows = {}
+        self._buckets = {}
+        self._bucket_rows = {}
+        self.built_at = None
+
+    def build(self):
+        matrix = ProfileMatrix.from_queryset(RoommateProfile.objects.all())
+        buckets = {}
+        for row, key in enumerate(map(tuple, matrix.codes.tolist())):
+            buckets.setdefault(key, set()).add(row)
+
+        with self._lock:
+            self._matrix = matrix
+            self._size = len(matrix)
+            self._rows = {user_id: row for row, user_id in enumerate(matrix.user_ids.tolist())}
+            self._buckets = buckets
+            self._bucket_rows = {}
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Build on first use and rebuild once older than ROOMMATE_INDEX_MAX_AGE seconds."""
+        max_age = getattr(settings, 'ROOMMATE_INDEX_MAX_AGE', 300)
+        if self.built_at is None or time.monotonic() - self.built_at > max_age:
+            self.build()
+
+    def update(self, profile):
+        """Re-embed one profile, moving it to another bucket if its preferences changed."""
+        with self._lock:
+            if self._matrix is None:
+                return
+            user_id = profile.user_profile.user_id
+            codes, cleanliness, budget = self._matrix.encode(profile)
+            row = self._rows.get(user_id)
+            if row is not None and np.array_equal(self._matrix.codes[row], codes):
+                self._matrix.cleanliness[row] = cleanliness
+                self._matrix.budgets[row] = budget
+                return
+
+            self._discard(user_id)
+            row = self._append(user_id, codes, cleanliness, budget)
+            key = tuple(codes.tolist())
+            self._rows[user_id] = row
+            self._buckets.setdefault(key, set()).add(row)
+            self._bucket_rows.pop(key, None)
+
+    def remove(self, user_id):
+        with self._lock:
+            if self._matrix is not None:
+                self._discard(user_id)
+
+    def search(self, profile, limit, probes=None, exclude=(), allowed=None):
+        """
+        Return ``(top, probed)`` where ``top`` holds up to ``limit``
+        ``(user_id, score)`` pairs ordered like the ranked list and ``probed``
+        is the number of buckets scored. ``probes=None`` visits buckets
+        until the bound proves the result exact; otherwise the search stops
+        after ``probes`` buckets, but only once ``limit`` eligible
+        candidates have been scored, since one bucket may hold none.
+        """
+        with self._lock:
+            if not self._buckets:
+                return [], 0
+            matrix = self._matrix
+            codes, cleanliness, budget = matrix.encode(profile)
+
+            keys = list(self._buckets)
+            categorical = (np.array(keys, dtype=np.int16) == codes) @ CATEGORICAL_WEIGHT_ARRAY
+            # Best score any bucket member could reach: full cleanliness and budget points
+            if budget:
+                bounds = np.round(categorical + CLEANLINESS_WEIGHT + BUDGET_WEIGHT, 1)
+            else:
+                bounds = np.round(
+                    (categorical + CLEANLINESS_WEIGHT) / (CATEGORICAL_WEIGHT_ARRAY.sum() + CLEANLINESS_WEIGHT) * 100, 1
+                )
+            order = np.argsort(-bounds, kind='stable')
+
+            excluded = np.fromiter(exclude, dtype=np.int64)
+            allowed = np.fromiter(allowed, dtype=np.int64) if allowed is not None else None
+            top_ids = np.empty(0, dtype=np.int64)
+            top_scores = np.empty(0, dtype=np.float64)
+            probed = 0
+
+            # Buckets sharing a bound are scored together in one vectorized pass
+            for level in np.unique(bounds[order])[::-1]:
+                if len(top_ids) >= limit and (level < top_scores[-1] or (probes is not None and probed >= probes)):
+                    break
+                level_keys = [keys[position] for position in order if bounds[position] == level]
+                rows = np.concatenate([self._rows_for(key) for key in level_keys])
+                ids = matrix.user_ids[rows]
+                scores = matrix.score_encoded(codes, cleanliness, budget, rows=rows)
+
+                keep = ~np.isin(ids, excluded)
+                if allowed is not None:
+                    keep &= np.isin(ids, allowed)
+                ids = np.concatenate([top_ids, ids[keep]])
+                scores = np.concatenate([top_scores, scores[keep]])
+                best = np.lexsort((ids, -scores))[:limit]
+                top_ids, top_scores = ids[best], scores[best]
+                probed += len(level_keys)
+
+            return list(zip(top_ids.tolist(), top_scores.tolist())), probed
+
+    def _rows_for(self, key):
+        rows = self._bucket_rows.get(key)
+        if rows is None:
+            rows = np.fromiter(self._buckets[key], dtype=np.int64)
+            self._bucket_rows[key] = rows
+        return rows
+
+    def _append(self, user_id, codes, cleanliness, budget):
+        matrix = self._matrix
+        if self._size == len(matrix):
+            # Grow the column store geometrically; rows past _size are spare capacity
+            extra = max(self._size, 16)
+            self._matrix = matrix = ProfileMatrix(
+                np.concatenate([matrix.user_ids, np.zeros(extra, dtype=np.int64)]),
+                np.concatenate([matrix.codes, np.zeros((extra, matrix.codes.shape[1]), dtype=np.int16)]),
+                np.concatenate([matrix.cleanliness, np.zeros(extra, dtype=np.int64)]),
+                np.concatenate([matrix.budgets, np.zeros(extra, dtype=np.int64)]),
+                matrix.vocabulary,
+            )
+        row = self._size
+        matrix.user_ids[row] = user_id
+        matrix.codes[row] = codes
+        matrix.cleanliness[row] = cleanliness
+        matrix.budgets[row] = budget
+        self._size += 1
+        return row
+
+    def _discard(self, user_id):
+        # The row itself stays behind as garbage until the next full build
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return
+        key = tuple(self._matrix.codes[row].tolist())
+        bucket = self._buckets[key]
+        bucket.discard(row)
+        if not bucket:
+            del self._buckets[key]
+        self._bucket_rows.pop(key, None)
+
+
+match_index = BucketIndex()
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def collapse_symmetric_pairs(apps, schema_editor):
+    CompatibilityScore = apps.get_model('roommate_matching', 'CompatibilityScore')
+    reversed_rows = CompatibilityScore.objects.filter(user1__gt=models.F('user2'))
+
+    # Drop the reversed half of pairs stored both ways, then flip the rest in place
+    reversed_rows.filter(
+        models.Exists(CompatibilityScore.objects.filter(
+            user1=models.OuterRef('user2'), user2=models.OuterRef('user1')
+        ))
+    ).delete()
+    reversed_rows.update(user1=models.F('user2'), user2=models.F('user1'))
+    CompatibilityScore.objects.filter(user1=models.F('user2')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roommate_matching', '0002_alter_matchrequest_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_symmetric_pairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='compatibilityscore',
+            constraint=models.CheckConstraint(condition=models.Q(('user1__lt', models.F('user2'))), name='compatibility_canonical_pair'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roommate_matching', '0003_canonical_compatibility_pairs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compatibilityscore',
+            index=models.Index(fields=['user1', '-score', 'user2'], name='compat_rank_user1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compatibilityscore',
+            index=models.Index(fields=['user2', '-score', 'user1'], name='compat_rank_user2_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roommate_matching', '0004_compatibility_ranking_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchrequest',
+            index=models.Index(fields=['receiver', 'sender'], name='match_receiver_sender_idx'),
+        ),
+    ]
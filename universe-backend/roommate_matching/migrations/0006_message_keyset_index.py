@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roommate_matching', '0005_matchrequest_receiver_sender_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['match_request', 'id'], name='message_request_id_idx'),
+        ),
+    ]
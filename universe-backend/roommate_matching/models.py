@@ -3,38 +3,6 @@ from django.db import models
 from django.contrib.auth.models import User
 from user_profiles.models import UserProfile, RoommateProfile
 
-class MatchRequest(models.Model):
-    STATUS_CHOICES = [
-        ('pending', 'Pending'),
-        ('accepted', 'Accepted'),
-        ('rejected', 'Rejected'),
-    ]
-    
-    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_roommate_requests')
-    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_roommate_requests')
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    message = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-    
-    class Meta:
-        unique_together = ['sender', 'receiver']
-    
-    def __str__(self):
-        return f"Request from {self.sender.username} to {self.receiver.username} - {self.status}"
-
-class CompatibilityScore(models.Model):
-    user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='compatibility_as_user1')
-    user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='compatibility_as_user2')
-    score = models.FloatField()  # 0-100 score
-    last_calculated = models.DateTimeField(auto_now=True)
-    
-    class Meta:
-        unique_together = ['user1', 'user2']
-    
-    def __str__(self):
-        return f"Compatibility between {self.user1.username} and {self.user2.username}: {self.score}%"
-    
 class MatchRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -51,13 +19,18 @@ class MatchRequest(models.Model):
     last_message_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
+        # unique_together already provides the (sender, receiver) index
         unique_together = ['sender', 'receiver']
         ordering = ['-last_message_at', '-created_at']
+        indexes = [
+            models.Index(fields=['receiver', 'sender'], name='match_receiver_sender_idx'),
+        ]
     
     def __str__(self):
         return f"Request from {self.sender.username} to {self.receiver.username} - {self.status}"
 
 class CompatibilityScore(models.Model):
+    # Scores are symmetric, so each pair is stored once with the lower user id as user1
     user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='compatibility_as_user1')
     user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='compatibility_as_user2')
     score = models.FloatField()  # 0-100 score
@@ -65,6 +38,14 @@ class CompatibilityScore(models.Model):
     
     class Meta:
         unique_together = ['user1', 'user2']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(user1__lt=models.F('user2')), name='compatibility_canonical_pair'),
+        ]
+        # Per-user ranking, one index for each side of the pair
+        indexes = [
+            models.Index(fields=['user1', '-score', 'user2'], name='compat_rank_user1_idx'),
+            models.Index(fields=['user2', '-score', 'user1'], name='compat_rank_user2_idx'),
+        ]
     
     def __str__(self):
         return f"Compatibility between {self.user1.username} and {self.user2.username}: {self.score}%"
@@ -78,6 +59,10 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination within a conversation
+            models.Index(fields=['match_request', 'id'], name='message_request_id_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} at {self.timestamp}"
\ No newline at end of file
@@ -0,0 +1,99 @@
+# roommate_matching/pairing.py
+import time
+
+import numpy as np
+
+
+def pair_cohort(matrix, candidates=20, passes=3, progress=None):
+    """
+    Pair the profiles in ``matrix`` so the total compatibility score is as
+    high as we can get it.
+
+    Every student keeps only their ``candidates`` best partners, edges of
+    that pruned graph are taken greedily best-first, students left over
+    are paired greedily among themselves, and then up to ``passes`` rounds
+    of 2-opt swaps (a-b, c-d -> a-c, b-d) over the candidate graph improve
+    the result. ``progress(stage, done, total)`` is called along the way.
+
+    Returns ``(pairs, unmatched, metrics)`` where ``pairs`` holds
+    ``(user_id, user_id, score)`` tuples.
+    """
+    started = time.monotonic()
+    report = progress or (lambda stage, done, total: None)
+    count = len(matrix)
+    candidates = max(1, min(candidates, count - 1)) if count > 1 else 0
+
+    # Pruned candidate graph: each row's best partners
+    neighbours = np.empty((count, candidates), dtype=np.int64)
+    edge_scores = {}
+    for i in range(count):
+        scores = matrix.scores_for_row(i)
+        scores[i] = -1
+        best = np.argpartition(-scores, candidates - 1)[:candidates] if candidates else []
+        neighbours[i] = best
+        for j, score in zip(np.asarray(best).tolist(), scores[best].tolist()):
+            edge_scores[(i, j) if i < j else (j, i)] = score
+        if i % 500 == 0 or i == count - 1:
+            report('candidates', i + 1, count)
+
+    # Greedy matching, best edge first (ties broken by row for determinism)
+    partner = np.full(count, -1, dtype=np.int64)
+    for (i, j), _ in sorted(edge_scores.items(), key=lambda item: (-item[1], item[0])):
+        if partner[i] == -1 and partner[j] == -1:
+            partner[i], partner[j] = j, i
+    report('greedy', int((partner != -1).sum()), count)
+
+    # Students whose candidates were all taken are paired among themselves
+    leftover = np.flatnonzero(partner == -1)
+    while len(leftover) > 1:
+        i, rest = leftover[0], leftover[1:]
+        j = rest[np.argmax(matrix.scores_for_row(i, rows=rest))]
+        partner[i], partner[j] = j, i
+        leftover = leftover[(leftover != i) & (leftover != j)]
+
+    def score(i, j):
+        key = (i, j) if i < j else (j, i)
+        if key not in edge_scores:
+            edge_scores[key] = float(matrix.scores_for_row(i, rows=[j])[0])
+        return edge_scores[key]
+
+    improvements = 0
+    for pass_number in range(passes):
+        improved = 0
+        for a in range(count):
+            b = partner[a]
+            if b == -1:
+                continue
+            for c in neighbours[a].tolist():
+                d = partner[c]
+                if c == b or d == -1 or d == a:
+                    continue
+                current = score(a, b) + score(c, d)
+                if score(a, c) + score(b, d) > current + 1e-9:
+                    partner[a], partner[c], partner[b], partner[d] = c, a, d, b
+                    improved += 1
+                    b = c
+        improvements += improved
+        report('improvement', pass_number + 1, passes)
+        if not improved:
+            break
+
+    pairs = [
+        (int(matrix.user_ids[i]), int(matrix.user_ids[j]), score(i, j))
+        for i, j in enumerate(partner.tolist())
+        if j > i
+    ]
+    unmatched = [int(matrix.user_ids[i]) for i in np.flatnonzero(partner == -1)]
+    pair_scores = np.array([pair_score for _, _, pair_score in pairs]) if pairs else np.zeros(1)
+    metrics = {
+        'students': count,
+        'pairs': len(pairs),
+        'unmatched': len(unmatched),
+        'total_score': round(float(pair_scores.sum()), 1) if pairs else 0.0,
+        'mean_score': round(float(pair_scores.mean()), 2) if pairs else 0.0,
+        'median_score': round(float(np.median(pair_scores)), 1) if pairs else 0.0,
+        'min_score': round(float(pair_scores.min()), 1) if pairs else 0.0,
+        'swaps': improvements,
+        'seconds': round(time.monotonic() - started, 2),
+    }
+    return pairs, unmatched, metrics
@@ -33,14 +33,21 @@ class MessageSerializer(serializers.ModelSerializer):
 class MatchRequestSerializer(serializers.ModelSerializer):
     sender_detail = UserSerializer(source='sender', read_only=True)
     receiver_detail = UserSerializer(source='receiver', read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
     
     class Meta:
         model = MatchRequest
         fields = ['id', 'sender', 'receiver', 'sender_detail', 'receiver_detail', 
-                 'status', 'message', 'messages', 'created_at', 'updated_at']
+                 'status', 'message', 'created_at', 'updated_at', 'last_message_at']
         read_only_fields = ['sender', 'sender_detail', 'receiver_detail', 
-                          'status', 'created_at', 'updated_at', 'messages']
+                          'status', 'created_at', 'updated_at', 'last_message_at']
+
+class MatchRequestSummarySerializer(MatchRequestSerializer):
+    # Both come from annotations on the inbox queryset
+    last_message_preview = serializers.CharField(read_only=True, allow_null=True)
+    unread_count = serializers.IntegerField(read_only=True)
+
+    class Meta(MatchRequestSerializer.Meta):
+        fields = MatchRequestSerializer.Meta.fields + ['last_message_preview', 'unread_count']
 
 class CompatibilityScoreSerializer(serializers.ModelSerializer):
     user1_detail = UserSerializer(source='user1', read_only=True)
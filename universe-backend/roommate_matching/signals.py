@@ -0,0 +1,44 @@
+# roommate_matching/signals.py
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from universe_backend.access_cache import access_cache
+from user_profiles.models import RoommateProfile
+from .access import match_key
+from .compatibility import SCORED_FIELDS, refresh_scores
+from .match_index import match_index
+from .models import CompatibilityScore, MatchRequest
+
+
+def _scored_values(instance):
+    # Read straight from __dict__ so deferred fields never trigger a query
+    return tuple(instance.__dict__.get(field) for field in SCORED_FIELDS)
+
+
+@receiver(post_init, sender=RoommateProfile)
+def remember_scored_fields(sender, instance, **kwargs):
+    instance._scored_snapshot = _scored_values(instance)
+
+
+@receiver(post_save, sender=RoommateProfile)
+def refresh_compatibility_scores(sender, instance, created, **kwargs):
+    current = _scored_values(instance)
+    if created or current != instance._scored_snapshot:
+        transaction.on_commit(lambda: refresh_scores(instance))
+        transaction.on_commit(lambda: match_index.update(instance))
+    instance._scored_snapshot = current
+
+
+@receiver(post_delete, sender=RoommateProfile)
+def drop_compatibility_scores(sender, instance, **kwargs):
+    user_id = instance.user_profile.user_id
+    CompatibilityScore.objects.filter(Q(user1_id=user_id) | Q(user2_id=user_id)).delete()
+    transaction.on_commit(lambda: match_index.remove(user_id))
+
+
+@receiver(post_save, sender=MatchRequest)
+@receiver(post_delete, sender=MatchRequest)
+def invalidate_match_access(sender, instance, **kwargs):
+    access_cache.invalidate(match_key(instance.pk))
@@ -1,20 +1,46 @@
+import binascii
+import os
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Q
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Substr
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
 
+from .access import is_participant, match_access
+from .consumers import typing_stats
 from .models import MatchRequest, CompatibilityScore, Message
+from .match_index import match_index
+from .pairing import pair_cohort
+from .compatibility import (
+    ProfileMatrix,
+    backfill_scores,
+    calculate_compatibility,
+    canonical_pair,
+    ranked_scores,
+    save_scores,
+    stored_scores,
+    unscored_profiles,
+)
 from .serializers import (
     MatchRequestSerializer,
+    MatchRequestSummarySerializer,
     CompatibilityScoreSerializer,
     MatchProfileSerializer,
     MessageSerializer
 )
 from user_profiles.models import UserProfile, RoommateProfile
 from user_profiles.serializers import UserSerializer, UserProfileSerializer, RoommateProfileSerializer
+from universe_backend.pagination import keyset_page, keyset_params
+
+# Widest ?move_in_window_days= accepted; also keeps the date arithmetic in range
+MAX_MOVE_IN_WINDOW_DAYS = 3650
 
 # Logging (optional)
 import logging
@@ -25,12 +51,41 @@ class MatchRequestViewSet(viewsets.ModelViewSet):
     queryset = MatchRequest.objects.all()
     serializer_class = MatchRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    preview_length = 140
 
     def get_queryset(self):
         user = self.request.user
-        return MatchRequest.objects.filter(
+        queryset = MatchRequest.objects.filter(
             Q(sender=user) | Q(receiver=user)
-        ).order_by('-created_at')
+        ).select_related('sender', 'receiver').order_by('-created_at')
+
+        if self.action == 'list':
+            latest = Message.objects.filter(match_request=OuterRef('pk')).order_by('-id')
+            queryset = queryset.annotate(
+                last_message_preview=Substr(Subquery(latest.values('content')[:1]), 1, self.preview_length),
+                unread_count=Count(
+                    'messages', filter=Q(messages__read=False) & ~Q(messages__sender=user)
+                ),
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return MatchRequestSummarySerializer
+        return super().get_serializer_class()
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """Page through a conversation's messages with ``?before_id=`` / ``?after_id=`` / ``?limit=``."""
+        match_request = self.get_object()
+        try:
+            page = keyset_params(request.query_params)
+        except ValueError:
+            return Response({"error": "Invalid pagination parameters."}, status=400)
+
+        messages = keyset_page(match_request.messages.select_related('sender__profile'), **page)
+        serializer = MessageSerializer(messages, many=True, context={'request': request})
+        return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def accept(self, request, pk=None):
@@ -68,10 +123,7 @@ class MatchRequestViewSet(viewsets.ModelViewSet):
         if receiver == request.user:
             return Response({"error": "You cannot send a request to yourself"}, status=400)
 
-        existing = MatchRequest.objects.filter(
-            (Q(sender=request.user) & Q(receiver=receiver)) |
-            (Q(sender=receiver) & Q(receiver=request.user))
-        ).first()
+        existing = _match_request_between(request.user, receiver)
         if existing:
             return Response({"error": f"A request already exists (status: {existing.status})"}, status=400)
 
@@ -81,6 +133,8 @@ class MatchRequestViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=201)
 class RoommateMatchingViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
+    page_size = 20
+    max_page_size = 100
 
     def list(self, request):
         try:
@@ -89,55 +143,169 @@ class RoommateMatchingViewSet(viewsets.ViewSet):
         except (UserProfile.DoesNotExist, RoommateProfile.DoesNotExist):
             return Response({"detail": "Please complete your profile."}, status=400)
 
-        other_profiles = RoommateProfile.objects.exclude(
+        try:
+            constraints = _hard_constraints(request.query_params, roommate_profile)
+        except (ValueError, InvalidOperation, OverflowError):
+            return Response({"detail": "Invalid filter parameters."}, status=400)
+
+        if request.query_params.get('mode') == 'approx':
+            return self._approximate_top(request, roommate_profile, constraints)
+
+        if 'limit' in request.query_params or 'cursor' in request.query_params:
+            return self._ranked_page(request, roommate_profile, constraints)
+
+        other_profiles = list(RoommateProfile.objects.exclude(
             user_profile__user=request.user
-        ).select_related('user_profile__user')
+        ).filter(constraints).select_related('user_profile__user'))
+
+        scores = stored_scores(request.user.id)
+        unscored = [other for other in other_profiles if other.user_profile.user_id not in scores]
+        if unscored:
+            # Pairs scored before profile saves kept scores fresh are backfilled in one pass
+            matrix = ProfileMatrix.from_profiles(unscored)
+            computed = dict(zip(matrix.user_ids.tolist(), matrix.scores_for(roommate_profile).tolist()))
+            save_scores(request.user.id, computed, overwrite=False)
+            scores.update(computed)
+
+        matches = self._build_matches(request, other_profiles, scores)
+        matches.sort(key=lambda x: x['compatibility_score'], reverse=True)
+        serializer = MatchProfileSerializer(matches, many=True, context={'request': request})
+        return Response(serializer.data)
 
+    def _ranked_page(self, request, roommate_profile, constraints):
+        """
+        Serve one page of the ranking (score desc, then user id) straight from
+        the stored scores, so a page costs O(limit) no matter how many profiles exist.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.page_size)), 1), self.max_page_size)
+            cursor = _decode_cursor(request.query_params.get('cursor'))
+        except ValueError:
+            return Response({"detail": "Invalid limit or cursor."}, status=400)
+
+        # New profiles are scored by the post_save signal and bulk warming is
+        # precompute_compatibility's job; pairs either one missed (profiles from
+        # before scoring existed, a failed signal) are backfilled on the first page
+        if cursor is None and unscored_profiles(request.user.id).exists():
+            backfill_scores(roommate_profile)
+
+        candidates = None
+        if constraints:
+            candidates = RoommateProfile.objects.filter(constraints).values('user_profile__user_id')
+        ranked = ranked_scores(request.user.id, limit + 1, after=cursor, candidates=candidates)
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
+
+        profiles = {
+            profile.user_profile.user_id: profile
+            for profile in RoommateProfile.objects.filter(
+                user_profile__user_id__in=[user_id for user_id, _ in ranked]
+            ).select_related('user_profile__user')
+        }
+        matches = self._build_matches(
+            request,
+            [profiles[user_id] for user_id, _ in ranked if user_id in profiles],
+            dict(ranked),
+        )
+        serializer = MatchProfileSerializer(matches, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'next_cursor': _encode_cursor(*ranked[-1]) if has_more else None,
+        })
+
+    def _approximate_top(self, request, roommate_profile, constraints):
+        """
+        Answer ``?mode=approx`` from the in-process bucket index. ``probes``
+        caps how many preference buckets are scored once ``limit`` candidates
+        are in hand; leaving it out returns the exact top ``limit``.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.page_size)), 1), self.max_page_size)
+            probes = request.query_params.get('probes')
+            probes = max(int(probes), 1) if probes else None
+        except ValueError:
+            return Response({"detail": "Invalid limit or probes."}, status=400)
+
+        allowed = None
+        if constraints:
+            allowed = set(RoommateProfile.objects.filter(constraints).values_list('user_profile__user_id', flat=True))
+
+        match_index.ensure_fresh()
+        top, probed = match_index.search(
+            roommate_profile, limit, probes=probes, exclude={request.user.id}, allowed=allowed
+        )
+
+        profiles = {
+            profile.user_profile.user_id: profile
+            for profile in RoommateProfile.objects.filter(
+                user_profile__user_id__in=[user_id for user_id, _ in top]
+            ).select_related('user_profile__user')
+        }
+        matches = self._build_matches(
+            request,
+            [profiles[user_id] for user_id, _ in top if user_id in profiles],
+            dict(top),
+        )
+        serializer = MatchProfileSerializer(matches, many=True, context={'request': request})
+        return Response({'results': serializer.data, 'probed_buckets': probed})
+
+    @action(detail=False, methods=['post'], url_path='cohort-pairing', permission_classes=[permissions.IsAdminUser])
+    def cohort_pairing(self, request):
+        """
+        Staff only: pair a cohort (``user_ids``, or every roommate profile)
+        to maximise total compatibility.
+        """
+        profiles = RoommateProfile.objects.order_by('user_profile__user_id')
+        try:
+            if (user_ids := request.data.get('user_ids')):
+                profiles = profiles.filter(user_profile__user_id__in=[int(user_id) for user_id in user_ids])
+            candidates = int(request.data.get('candidates', 20))
+            passes = int(request.data.get('passes', 3))
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid pairing parameters."}, status=400)
+
+        pairs, unmatched, metrics = pair_cohort(
+            ProfileMatrix.from_queryset(profiles), candidates=candidates, passes=passes
+        )
+        return Response({
+            'pairs': [{'user1': user1, 'user2': user2, 'score': score} for user1, user2, score in pairs],
+            'unmatched': unmatched,
+            'metrics': metrics,
+        })
+
+    def _build_matches(self, request, other_profiles, scores):
+        statuses = _match_statuses(request.user)
         matches = []
         for other in other_profiles:
             other_user = other.user_profile.user
-            compatibility, _ = CompatibilityScore.objects.get_or_create(
-                user1=request.user,
-                user2=other_user,
-                defaults={'score': self._calculate_compatibility(roommate_profile, other)}
-            )
-            match_request = MatchRequest.objects.filter(
-                (Q(sender=request.user) & Q(receiver=other_user)) |
-                (Q(sender=other_user) & Q(receiver=request.user))
-            ).first()
-            match_status = match_request.status if match_request else 'none'
-
             matches.append({
                 'user': other_user,
                 'profile': other.user_profile,
                 'roommate_profile': other,
-                'compatibility_score': compatibility.score,
-                'match_status': match_status
+                'compatibility_score': scores[other_user.id],
+                'match_status': statuses.get(other_user.id, 'none')
             })
-
-        matches.sort(key=lambda x: x['compatibility_score'], reverse=True)
-        serializer = MatchProfileSerializer(matches, many=True, context={'request': request})
-        return Response(serializer.data)
+        return matches
 
     def retrieve(self, request, pk=None):
         try:
             other_user = get_object_or_404(User, id=pk)
+            if other_user == request.user:
+                return Response({"detail": "You cannot match with yourself."}, status=400)
             other_user_profile = get_object_or_404(UserProfile, user=other_user)
             other_roommate = get_object_or_404(RoommateProfile, user_profile=other_user_profile)
 
             user_profile = get_object_or_404(UserProfile, user=request.user)
             my_roommate = get_object_or_404(RoommateProfile, user_profile=user_profile)
 
+            user1_id, user2_id = canonical_pair(request.user.id, other_user.id)
             compatibility, _ = CompatibilityScore.objects.get_or_create(
-                user1=request.user,
-                user2=other_user,
+                user1_id=user1_id,
+                user2_id=user2_id,
                 defaults={'score': self._calculate_compatibility(my_roommate, other_roommate)}
             )
 
-            match_request = MatchRequest.objects.filter(
-                (Q(sender=request.user) & Q(receiver=other_user)) |
-                (Q(sender=other_user) & Q(receiver=request.user))
-            ).first()
+            match_request = _match_request_between(request.user, other_user)
             match_status = match_request.status if match_request else 'none'
             match_request_data = MatchRequestSerializer(match_request, context={'request': request}).data if match_request else None
 
@@ -154,49 +322,127 @@ class RoommateMatchingViewSet(viewsets.ViewSet):
             return Response({"detail": "Profile not found"}, status=404)
 
     def _calculate_compatibility(self, user_profile, other_profile):
-        score = 0
-        total_weight = 0
-
-        def add(weight, match):
-            nonlocal score, total_weight
-            total_weight += weight
-            if match: score += weight
-
-        add(15, user_profile.smoking_preference == other_profile.smoking_preference)
-        add(10, user_profile.drinking_preference == other_profile.drinking_preference)
-        add(20, user_profile.sleep_habits == other_profile.sleep_habits)
-        add(15, user_profile.study_habits == other_profile.study_habits)
-        add(10, user_profile.guests_preference == other_profile.guests_preference)
-
-        weight = 20
-        diff = abs(user_profile.cleanliness_level - other_profile.cleanliness_level)
-        score += weight * {0: 1, 1: 0.7, 2: 0.4}.get(diff, 0)
-        total_weight += weight
-
-        if user_profile.max_rent_budget and other_profile.max_rent_budget:
-            weight = 10
-            diff_pct = abs(user_profile.max_rent_budget - other_profile.max_rent_budget) / max(user_profile.max_rent_budget, other_profile.max_rent_budget)
-            score += weight * (1 if diff_pct <= 0.1 else 0.7 if diff_pct <= 0.2 else 0.4 if diff_pct <= 0.3 else 0)
-            total_weight += weight
-
-        return round((score / total_weight) * 100, 1) if total_weight else 50.0
+        return calculate_compatibility(user_profile, other_profile)
+
+
+def _match_request_between(user, other_user):
+    return MatchRequest.objects.filter(
+        (Q(sender=user) & Q(receiver=other_user)) |
+        (Q(sender=other_user) & Q(receiver=user))
+    ).first()
+
+
+def _match_statuses(user):
+    """
+    Map the id of everyone ``user`` has a match request with to its status,
+    in one query. Default ordering is kept so a pair with requests in both
+    directions resolves to the same request ``.first()`` would return.
+    """
+    statuses = {}
+    rows = MatchRequest.objects.filter(
+        Q(sender=user) | Q(receiver=user)
+    ).values_list('sender_id', 'receiver_id', 'status')
+    for sender_id, receiver_id, match_status in rows:
+        statuses.setdefault(receiver_id if sender_id == user.id else sender_id, match_status)
+    return statuses
+
+
+def _hard_constraints(params, roommate_profile):
+    """
+    Build the deal-breaker filters for ``roommate-matches`` as a Q object so
+    they run as indexed SQL before any scoring happens.
+    """
+    constraints = Q()
+
+    if (delta := params.get('max_budget_delta')) and roommate_profile.max_rent_budget is not None:
+        delta = Decimal(delta)
+        constraints &= Q(
+            max_rent_budget__gte=roommate_profile.max_rent_budget - delta,
+            max_rent_budget__lte=roommate_profile.max_rent_budget + delta,
+        )
+
+    if (days := params.get('move_in_window_days')) and roommate_profile.preferred_move_in_date:
+        days = int(days)
+        if not 1 <= days <= MAX_MOVE_IN_WINDOW_DAYS:
+            raise ValueError(f"move_in_window_days must be between 1 and {MAX_MOVE_IN_WINDOW_DAYS}")
+        window = timedelta(days=days)
+        constraints &= Q(
+            preferred_move_in_date__gte=roommate_profile.preferred_move_in_date - window,
+            preferred_move_in_date__lte=roommate_profile.preferred_move_in_date + window,
+        )
+
+    if (smoking := params.get('smoking')):
+        constraints &= Q(smoking_preference__in=[value.strip() for value in smoking.split(',')])
+
+    if (guests := params.get('guests')):
+        constraints &= Q(guests_preference__in=[value.strip() for value in guests.split(',')])
+
+    if (val := params.get('min_cleanliness')):
+        constraints &= Q(cleanliness_level__gte=int(val))
+
+    if (val := params.get('max_cleanliness')):
+        constraints &= Q(cleanliness_level__lte=int(val))
+
+    return constraints
+
+
+def _encode_cursor(user_id, score):
+    return urlsafe_b64encode(f"{score!r}:{user_id}".encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Return the ``(score, user_id)`` position a cursor points past, or None."""
+    if not cursor:
+        return None
+    try:
+        score, user_id = urlsafe_b64decode(cursor.encode()).decode().split(':')
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Malformed cursor") from exc
+    return float(score), int(user_id)
+
+
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Message.objects.filter(
-            match_request__in=MatchRequest.objects.filter(
-                Q(sender=self.request.user) | Q(receiver=self.request.user)
-            )
-        ).order_by('timestamp')
-
         match_request_id = self.request.query_params.get('match_request')
         if match_request_id:
-            queryset = queryset.filter(match_request__id=match_request_id)
+            # Polling a single conversation: check access through the cache
+            try:
+                access = match_access(match_request_id)
+            except ValueError:
+                return Message.objects.none()
+            if not is_participant(access, self.request.user.id):
+                return Message.objects.none()
+            queryset = Message.objects.filter(match_request_id=match_request_id)
+        else:
+            queryset = Message.objects.filter(
+                match_request__in=MatchRequest.objects.filter(
+                    Q(sender=self.request.user) | Q(receiver=self.request.user)
+                )
+            )
+        return queryset.select_related('sender__profile').order_by('timestamp')
 
-        return queryset
+    def list(self, request, *args, **kwargs):
+        """
+        Bounded, oldest-first pages: ``?after_id=`` returns only newer messages
+        for polling clients and ``?before_id=`` scrolls back through history.
+        """
+        try:
+            page = keyset_params(request.query_params)
+        except ValueError:
+            return Response({"error": "Invalid pagination parameters."}, status=400)
+
+        messages = keyset_page(self.filter_queryset(self.get_queryset()), **page)
+        serializer = self.get_serializer(messages, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='typing-stats', permission_classes=[permissions.IsAdminUser])
+    def typing_stats(self, request):
+        """Typing frames received, forwarded and suppressed by this worker process."""
+        return Response({'pid': os.getpid(), **typing_stats})
 
     def perform_create(self, serializer):
         match_request_id = self.request.data.get('match_request')
@@ -209,7 +455,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         )
 
         match_request.last_message_at = timezone.now()
-        match_request.save()
+        match_request.save(update_fields=['last_message_at'])
 
         serializer.save(
             sender=self.request.user,
@@ -0,0 +1,22 @@
+# study_groups/access.py
+from universe_backend.access_cache import access_cache
+from .models import GroupMembership
+
+
+def membership_key(group_id, user_id):
+    return ('group', int(group_id), user_id)
+
+
+def _load_membership(group_id, user_id):
+    return GroupMembership.objects.filter(group_id=group_id, user_id=user_id, is_accepted=True).exists()
+
+
+def is_group_member(group_id, user_id):
+    """Cached check that ``user_id`` is an accepted member of the group."""
+    return access_cache.get_or_load(membership_key(group_id, user_id), lambda: _load_membership(group_id, user_id))
+
+
+async def ais_group_member(group_id, user_id):
+    return await access_cache.aget_or_load(
+        membership_key(group_id, user_id), lambda: _load_membership(group_id, user_id)
+    )
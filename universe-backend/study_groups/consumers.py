@@ -1,12 +1,62 @@
 # study_groups/consumers.py
+import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.layers import get_channel_layer
 import json
 from channels.db import database_sync_to_async
 from django.db.models import Q
-from .models import StudyGroup, GroupMembership, GroupMessage
+from universe_backend.write_behind import QueuePool, WriteBehindQueue
+from .access import ais_group_member
+from .models import StudyGroup, GroupMessage
 from django.contrib.auth.models import User
 
+
+def _group_writer(room_group_name):
+    group_id = int(room_group_name.rsplit('_', 1)[1])
+
+    def save(batch):
+        return GroupMessage.objects.bulk_create(
+            [GroupMessage(group_id=group_id, sender_id=sender.id, content=content) for sender, content in batch]
+        )
+
+    async def flush(batch):
+        messages = await database_sync_to_async(save)(batch)
+        # Payloads come from the scope users and the group id already in hand
+        payloads = [
+            {
+                'id': msg.id,
+                'group': group_id,
+                'sender': {
+                    'id': sender.id,
+                    'username': sender.username,
+                },
+                'content': msg.content,
+                'timestamp': msg.timestamp.isoformat()
+            }
+            for msg, (sender, _) in zip(messages, batch)
+        ]
+        channel_layer = get_channel_layer()
+        for payload in payloads:
+            await channel_layer.group_send(room_group_name, {
+                'type': 'chat_message',
+                'message': payload
+            })
+        return payloads
+
+    return WriteBehindQueue(flush, max_batch=100, max_delay=0.005)
+
+
+# Frames for one study group are coalesced for a few milliseconds per insert
+group_writers = QueuePool(_group_writer)
+
+
 class StudyGroupConsumer(AsyncWebsocketConsumer):
+    writer = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.persisting = set()
+
     async def connect(self):
         self.group_id = self.scope['url_route']['kwargs']['group_id']
         self.room_group_name = f'study_group_{self.group_id}'
@@ -18,37 +68,41 @@ class StudyGroupConsumer(AsyncWebsocketConsumer):
 
         is_member = await self.is_group_member(user.id)
         if is_member:
+            self.writer = group_writers.acquire(self.room_group_name)
             await self.channel_layer.group_add(self.room_group_name, self.channel_name)
             await self.accept()
         else:
             await self.close()
 
-    @database_sync_to_async
-    def is_group_member(self, user_id):
-        return GroupMembership.objects.filter(
-            group_id=self.group_id,
-            user_id=user_id,
-            is_accepted=True
-        ).exists()
+    async def is_group_member(self, user_id):
+        return await ais_group_member(self.group_id, user_id)
 
     async def disconnect(self, close_code):
+        if self.writer is not None:
+            await group_writers.release(self.room_group_name)
+            await asyncio.gather(*self.persisting, return_exceptions=True)
+            self.writer = None
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
     async def receive(self, text_data):
         data = json.loads(text_data)
 
-        if data['type'] == 'chat_message':
-            sender_id = self.scope["user"].id
-            message = data['message']
-            saved_msg = await self.save_message(sender_id, message)
-
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
+        if data.get('type') == 'chat_message':
+            message = data.get('message')
+            if isinstance(message, dict) and message.get('id'):
+                # Already stored through the REST endpoint; just relay it
+                await self.channel_layer.group_send(self.room_group_name, {
                     'type': 'chat_message',
-                    'message': saved_msg
-                }
-            )
+                    'message': message
+                })
+                return
+            content = message.get('content') if isinstance(message, dict) else message
+            if not isinstance(content, str) or not content.strip():
+                return
+            # Queued in arrival order and broadcast once the batch is stored
+            task = asyncio.ensure_future(self.save_message(self.scope["user"], content))
+            self.persisting.add(task)
+            task.add_done_callback(self.persisting.discard)
 
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
@@ -56,20 +110,11 @@ class StudyGroupConsumer(AsyncWebsocketConsumer):
             'message': event['message']
         }))
 
-    @database_sync_to_async
-    def save_message(self, sender_id, content):
-        msg = GroupMessage.objects.create(
-            group_id=self.group_id,
-            sender_id=sender_id,
-            content=content
-        )
-        return {
-            'id': msg.id,
-            'group': msg.group.id,
-            'sender': {
-                'id': msg.sender.id,
-                'username': msg.sender.username,
-            },
-            'content': msg.content,
-            'timestamp': msg.timestamp.isoformat()
-        }
+    async def save_message(self, sender, content):
+        try:
+            return await self.writer.submit((sender, content))
+        except Exception:
+            await self.send(text_data=json.dumps({
+                'type': 'chat_error',
+                'detail': 'Message could not be saved.'
+            }))
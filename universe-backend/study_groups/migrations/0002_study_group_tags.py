@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_subject_tags(apps, schema_editor):
+    StudyGroup = apps.get_model('study_groups', 'StudyGroup')
+    StudyGroupTag = apps.get_model('study_groups', 'StudyGroupTag')
+    rows = []
+    for group_id, subject_tags in StudyGroup.objects.values_list('id', 'subject_tags').iterator():
+        if isinstance(subject_tags, str):
+            subject_tags = subject_tags.split(',')
+        tags = {str(tag).strip().lower()[:100] for tag in subject_tags or []}
+        rows.extend(StudyGroupTag(group_id=group_id, tag=tag) for tag in tags if tag)
+    StudyGroupTag.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_groups', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudyGroupTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=100)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='study_groups.studygroup')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'group'], name='studygroup_tag_group_idx')],
+                'unique_together': {('group', 'tag')},
+            },
+        ),
+        migrations.RunPython(index_subject_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+
+
+def build_suggestions(apps, schema_editor):
+    UserProfile = apps.get_model('user_profiles', 'UserProfile')
+    StudyGroup = apps.get_model('study_groups', 'StudyGroup')
+    StudyGroupTag = apps.get_model('study_groups', 'StudyGroupTag')
+    GroupMembership = apps.get_model('study_groups', 'GroupMembership')
+    UserInterestTag = apps.get_model('study_groups', 'UserInterestTag')
+    GroupSuggestion = apps.get_model('study_groups', 'GroupSuggestion')
+
+    user_tags = {}
+    for user_id, interests in UserProfile.objects.exclude(interests='').values_list('user_id', 'interests').iterator():
+        tags = {tag.strip().lower()[:100] for tag in interests.split(',')} - {''}
+        if tags:
+            user_tags[user_id] = tags
+    UserInterestTag.objects.bulk_create(
+        [UserInterestTag(user_id=user_id, tag=tag) for user_id, tags in user_tags.items() for tag in tags],
+        batch_size=1000,
+    )
+
+    tag_groups = defaultdict(set)
+    for group_id, tag in StudyGroupTag.objects.values_list('group_id', 'tag').iterator():
+        tag_groups[tag].add(group_id)
+    creators = dict(StudyGroup.objects.values_list('id', 'creator_id'))
+    members = set(GroupMembership.objects.values_list('user_id', 'group_id'))
+
+    rows = []
+    for user_id, tags in user_tags.items():
+        overlaps = Counter(group_id for tag in tags for group_id in tag_groups.get(tag, ()))
+        rows.extend(
+            GroupSuggestion(user_id=user_id, group_id=group_id, overlap=overlap)
+            for group_id, overlap in overlaps.items()
+            if creators[group_id] != user_id and (user_id, group_id) not in members
+        )
+    GroupSuggestion.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_groups', '0002_study_group_tags'),
+        ('user_profiles', '0004_roommate_profile_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('overlap', models.PositiveIntegerField()),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to='study_groups.studygroup')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_suggestions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-overlap'], name='suggestion_user_overlap_idx')],
+                'unique_together': {('user', 'group')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserInterestTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interest_tags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'user'], name='interest_tag_user_idx')],
+                'unique_together': {('user', 'tag')},
+            },
+        ),
+        migrations.RunPython(build_suggestions, migrations.RunPython.noop),
+    ]
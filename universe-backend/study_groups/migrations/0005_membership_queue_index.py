@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_groups', '0004_group_message_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['group', 'is_accepted', 'requested_at'], name='membership_queue_idx'),
+        ),
+    ]
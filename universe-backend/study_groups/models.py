@@ -13,6 +13,43 @@ class StudyGroup(models.Model):
     def __str__(self):
         return self.name
 
+class StudyGroupTag(models.Model):
+    """Inverted index over StudyGroup.subject_tags, kept in sync by signals."""
+    group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='tags')
+    tag = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ['group', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'group'], name='studygroup_tag_group_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} ({self.group_id})"
+
+class UserInterestTag(models.Model):
+    """Normalized UserProfile.interests, indexed by tag to find who a group is relevant to."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='interest_tags')
+    tag = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ['user', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'user'], name='interest_tag_user_idx'),
+        ]
+
+class GroupSuggestion(models.Model):
+    """Materialized suggestion: ``overlap`` interests shared between a user and a group."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='group_suggestions')
+    group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='suggestions')
+    overlap = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['user', 'group']
+        indexes = [
+            models.Index(fields=['user', '-overlap'], name='suggestion_user_overlap_idx'),
+        ]
+
 class GroupMembership(models.Model):
     group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='memberships')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -21,9 +58,19 @@ class GroupMembership(models.Model):
 
     class Meta:
         unique_together = ['group', 'user']
+        indexes = [
+            # Pending-request queue per group
+            models.Index(fields=['group', 'is_accepted', 'requested_at'], name='membership_queue_idx'),
+        ]
 
 class GroupMessage(models.Model):
     group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination within a group
+            models.Index(fields=['group', 'id'], name='groupmessage_group_id_idx'),
+        ]
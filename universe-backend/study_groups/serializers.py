@@ -5,6 +5,11 @@ from django.contrib.auth.models import User
 from user_profiles.serializers import UserSerializer 
 
 class StudyGroupSerializer(serializers.ModelSerializer):
+    # Annotated by StudyGroupViewSet.get_queryset; omitted on unannotated instances
+    member_count = serializers.IntegerField(read_only=True)
+    pending_count = serializers.IntegerField(read_only=True)
+    is_member = serializers.BooleanField(read_only=True)
+
     class Meta:
         model = StudyGroup
         fields = '__all__'
@@ -0,0 +1,64 @@
+# study_groups/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from universe_backend.access_cache import access_cache
+from user_profiles.models import UserProfile
+from .access import membership_key
+from .models import GroupMembership, StudyGroup
+from .tags import (
+    refresh_group_suggestions,
+    refresh_suggestion,
+    refresh_user_suggestions,
+    sync_group_tags,
+    sync_user_tags,
+)
+
+
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def invalidate_membership_access(sender, instance, **kwargs):
+    access_cache.invalidate(membership_key(instance.group_id, instance.user_id))
+
+
+@receiver(post_init, sender=StudyGroup)
+def remember_subject_tags(sender, instance, **kwargs):
+    instance._tags_snapshot = instance.__dict__.get('subject_tags')
+
+
+@receiver(post_save, sender=StudyGroup)
+def sync_subject_tags(sender, instance, created, **kwargs):
+    if created or instance.subject_tags != instance._tags_snapshot:
+        sync_group_tags(instance)
+        group_id = instance.pk
+        transaction.on_commit(lambda: refresh_group_suggestions(group_id))
+    instance._tags_snapshot = instance.subject_tags
+
+
+@receiver(post_save, sender=GroupMembership)
+def drop_joined_suggestion(sender, instance, created, **kwargs):
+    if created:
+        user_id, group_id = instance.user_id, instance.group_id
+        transaction.on_commit(lambda: refresh_suggestion(user_id, group_id))
+
+
+@receiver(post_delete, sender=GroupMembership)
+def restore_left_suggestion(sender, instance, **kwargs):
+    # Runs after commit, so a membership removed with its group finds no tags left
+    user_id, group_id = instance.user_id, instance.group_id
+    transaction.on_commit(lambda: refresh_suggestion(user_id, group_id))
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_interests(sender, instance, **kwargs):
+    instance._interests_snapshot = instance.__dict__.get('interests')
+
+
+@receiver(post_save, sender=UserProfile)
+def sync_interest_tags(sender, instance, created, **kwargs):
+    if instance.interests != instance._interests_snapshot or (created and instance.interests):
+        sync_user_tags(instance.user_id, instance.interests)
+        user_id = instance.user_id
+        transaction.on_commit(lambda: refresh_user_suggestions(user_id))
+    instance._interests_snapshot = instance.interests
@@ -0,0 +1,104 @@
+# study_groups/tags.py
+from django.db import transaction
+from django.db.models import Count
+
+from .models import GroupMembership, GroupSuggestion, StudyGroup, StudyGroupTag, UserInterestTag
+
+TAG_MAX_LENGTH = StudyGroupTag._meta.get_field('tag').max_length
+
+
+def normalize_tags(values):
+    """Lower-cased, de-duplicated tags from a list or a comma-separated string."""
+    if not values:
+        return []
+    if isinstance(values, str):
+        values = values.split(',')
+    tags = []
+    for value in values:
+        tag = str(value).strip().lower()[:TAG_MAX_LENGTH]
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def _sync_tags(model, owner, values):
+    wanted = set(normalize_tags(values))
+    rows = model.objects.filter(**owner)
+    existing = set(rows.values_list('tag', flat=True))
+    if existing - wanted:
+        rows.filter(tag__in=existing - wanted).delete()
+    if wanted - existing:
+        model.objects.bulk_create([model(tag=tag, **owner) for tag in wanted - existing], ignore_conflicts=True)
+    return wanted
+
+
+def sync_group_tags(group):
+    """Make the group's StudyGroupTag rows match its subject_tags."""
+    return _sync_tags(StudyGroupTag, {'group_id': group.pk}, group.subject_tags)
+
+
+def sync_user_tags(user_id, interests):
+    """Make the user's UserInterestTag rows match their comma-separated interests."""
+    return _sync_tags(UserInterestTag, {'user_id': user_id}, interests)
+
+
+def groups_matching_tags(tags):
+    """Groups sharing any of ``tags``, most shared tags first and then newest first."""
+    return StudyGroup.objects.filter(tags__tag__in=tags).annotate(
+        overlap=Count('tags')
+    ).order_by('-overlap', '-created_at')
+
+
+def _save_suggestions(rows):
+    GroupSuggestion.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['user', 'group'], update_fields=['overlap']
+    )
+
+
+def refresh_user_suggestions(user_id):
+    """Rebuild one user's suggestions from their interest tags."""
+    tags = UserInterestTag.objects.filter(user_id=user_id).values('tag')
+    groups = groups_matching_tags(tags).exclude(creator_id=user_id).exclude(
+        memberships__user_id=user_id
+    ).values_list('id', 'overlap')
+    with transaction.atomic():
+        GroupSuggestion.objects.filter(user_id=user_id).delete()
+        GroupSuggestion.objects.bulk_create(
+            [GroupSuggestion(user_id=user_id, group_id=group_id, overlap=overlap) for group_id, overlap in groups]
+        )
+
+
+def refresh_group_suggestions(group_id):
+    """
+    Recompute one group's row for every user holding one of its tags after
+    the group is created or re-tagged; nobody else is touched.
+    """
+    group = StudyGroup.objects.filter(pk=group_id).values('creator_id').first()
+    if group is None:
+        return
+    overlaps = dict(
+        UserInterestTag.objects.filter(tag__in=StudyGroupTag.objects.filter(group_id=group_id).values('tag'))
+        .exclude(user_id=group['creator_id'])
+        .exclude(user__in=GroupMembership.objects.filter(group_id=group_id).values('user'))
+        .values('user').annotate(overlap=Count('id')).values_list('user', 'overlap')
+    )
+    with transaction.atomic():
+        GroupSuggestion.objects.filter(group_id=group_id).exclude(user_id__in=list(overlaps)).delete()
+        _save_suggestions(
+            [GroupSuggestion(user_id=user_id, group_id=group_id, overlap=overlap) for user_id, overlap in overlaps.items()]
+        )
+
+
+def refresh_suggestion(user_id, group_id):
+    """Re-evaluate a single (user, group) suggestion, e.g. after leaving a group."""
+    if GroupMembership.objects.filter(user_id=user_id, group_id=group_id).exists() or \
+            StudyGroup.objects.filter(pk=group_id, creator_id=user_id).exists():
+        GroupSuggestion.objects.filter(user_id=user_id, group_id=group_id).delete()
+        return
+    overlap = StudyGroupTag.objects.filter(
+        group_id=group_id, tag__in=UserInterestTag.objects.filter(user_id=user_id).values('tag')
+    ).count()
+    if overlap:
+        _save_suggestions([GroupSuggestion(user_id=user_id, group_id=group_id, overlap=overlap)])
+    else:
+        GroupSuggestion.objects.filter(user_id=user_id, group_id=group_id).delete()
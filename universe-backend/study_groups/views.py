@@ -1,6 +1,10 @@
 # study_groups/views.py
 from django.db import models
-from rest_framework import viewsets, permissions
+from django.db.models import Count, Exists, OuterRef, Q
+from rest_framework import viewsets, permissions, status
+from rest_framework.response import Response
+from universe_backend.pagination import keyset_page, keyset_params
+from .access import is_group_member
 from .models import StudyGroup, GroupMembership, GroupMessage
 from .serializers import StudyGroupSerializer, GroupMembershipSerializer, GroupMessageSerializer
 from rest_framework.decorators import action
@@ -10,23 +14,37 @@ class StudyGroupViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='suggested')
     def suggested_groups(self, request):
-        user_profile = request.user.profile  # Assumes a related `UserProfile` model
-        if not user_profile.interests:
-            return Response([], status=200)
-
-        user_interests = [i.strip().lower() for i in user_profile.interests.split(',') if i.strip()]
-        
-        matching_groups = StudyGroup.objects.filter(
-            subject_tags__overlap=user_interests
-        ).exclude(creator=request.user)
+        # Materialized per user and refreshed as groups, interests and memberships change
+        suggestions = self.get_queryset().filter(suggestions__user=request.user).order_by(
+            '-suggestions__overlap', '-created_at'
+        )
 
-        serializer = self.get_serializer(matching_groups, many=True)
+        serializer = self.get_serializer(suggestions, many=True)
         return Response(serializer.data)
     
     queryset = StudyGroup.objects.all()
     serializer_class = StudyGroupSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        """Groups with their member and pending counts and the caller's membership, in one query."""
+        return StudyGroup.objects.annotate(
+            member_count=Count('memberships', filter=Q(memberships__is_accepted=True)),
+            pending_count=Count('memberships', filter=Q(memberships__is_accepted=False)),
+            is_member=Exists(GroupMembership.objects.filter(
+                group=OuterRef('pk'), user=self.request.user, is_accepted=True
+            )),
+        )
+
+    @action(detail=True, methods=['get'])
+    def pending(self, request, pk=None):
+        """The group's open join requests, oldest first, for its creator."""
+        group = self.get_object()
+        if group.creator != request.user:
+            return Response({"detail": "Only the group creator can view join requests."}, status=403)
+        requests = GroupMembership.objects.filter(group=group, is_accepted=False).order_by('requested_at')
+        return Response(GroupMembershipSerializer(requests, many=True).data)
+
     def perform_create(self, serializer):
         group = serializer.save(creator=self.request.user)
 
@@ -62,14 +80,30 @@ class GroupMessageViewSet(viewsets.ModelViewSet):
             return GroupMessage.objects.none()
 
         # Only allow if the user is accepted
-        is_member = GroupMembership.objects.filter(
-            group_id=group_id, user=user, is_accepted=True
-        ).exists()
+        try:
+            is_member = is_group_member(group_id, user.id)
+        except ValueError:
+            return GroupMessage.objects.none()
 
         if not is_member:
             return GroupMessage.objects.none()
 
-        return GroupMessage.objects.filter(group_id=group_id).order_by('timestamp')
+        return GroupMessage.objects.filter(group_id=group_id).select_related('sender').order_by('timestamp')
+
+    def list(self, request, *args, **kwargs):
+        """
+        Bounded, oldest-first pages: ``?since_id=`` returns only messages newer
+        than the last one the client has and ``?before_id=`` scrolls back.
+        """
+        try:
+            page = keyset_params(request.query_params, after='since_id')
+        except ValueError:
+            return Response({"error": "Invalid pagination parameters."}, status=400)
+
+        messages = keyset_page(self.filter_queryset(self.get_queryset()), **page)
+        serializer = self.get_serializer(messages, many=True)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
         group_id = self.request.data.get('group')
         serializer.save(sender=self.request.user, group_id=group_id)
@@ -81,9 +115,14 @@ class GroupMembershipViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return GroupMembership.objects.filter(
+        queryset = GroupMembership.objects.filter(
             models.Q(user=user) | models.Q(group__creator=user)
-        )
+        ).select_related('group')
+
+        group_id = self.request.query_params.get('group')
+        if group_id:
+            queryset = queryset.filter(group_id=group_id)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
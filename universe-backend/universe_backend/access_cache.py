@@ -0,0 +1,83 @@
+# universe_backend/access_cache.py
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+_MISSING = object()
+
+
+class AccessCache:
+    """
+    Small in-process TTL cache for access checks (match participants, group
+    membership) shared by the websocket consumers and the REST viewsets.
+
+    Entries expire after ACCESS_CACHE_TTL seconds and are invalidated
+    explicitly when the rows behind them change. A load that races with an
+    invalidation is returned to its caller but not stored.
+    """
+
+    def __init__(self, max_entries=50000):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._generation = 0
+        self.max_entries = max_entries
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'ACCESS_CACHE_TTL', 60)
+
+    def get_or_load(self, key, loader):
+        value = self._get(key)
+        if value is _MISSING:
+            generation = self._generation
+            value = loader()
+            self._set(key, value, generation)
+        return value
+
+    async def aget_or_load(self, key, loader):
+        """Like ``get_or_load``, only leaving the event loop on a miss."""
+        value = self._get(key)
+        if value is _MISSING:
+            generation = self._generation
+            value = await database_sync_to_async(loader)()
+            self._set(key, value, generation)
+        return value
+
+    def invalidate(self, key):
+        """Drop ``key`` now and again once the surrounding transaction commits."""
+        self._discard(key)
+        transaction.on_commit(lambda: self._discard(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return _MISSING
+        return entry[1]
+
+    def _set(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: entry for k, entry in self._entries.items() if entry[0] >= now}
+                # Still full of live entries: drop the oldest half
+                if len(self._entries) >= self.max_entries:
+                    self._entries = dict(list(self._entries.items())[len(self._entries) // 2:])
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def _discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+
+access_cache = AccessCache()
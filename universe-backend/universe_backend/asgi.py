@@ -11,12 +11,34 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-import roommate_matching.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'universe_backend.settings')
 
+# Set up Django before importing consumers, which import models
+django_asgi_app = get_asgi_application()
+
+import roommate_matching.routing
+import study_groups.routing
+from roommate_matching.consumers import chat_writers
+from study_groups.consumers import group_writers
+
+
+async def lifespan(scope, receive, send):
+    """Flush write-behind chat queues before the server stops."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await chat_writers.drain()
+            await group_writers.drain()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
+    "lifespan": lifespan,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             roommate_matching.routing.websocket_urlpatterns +
@@ -0,0 +1,146 @@
+# universe_backend/channel_layer_benchmark.py
+"""
+Throughput and latency of the Unix socket channel layer against the
+in-memory layer.
+
+    python -m universe_backend.channel_layer_benchmark --messages 20000 --members 10
+
+Each scenario first floods ``--messages`` group_sends out to ``--members``
+channels and reports deliveries per second, then paces ``--probes`` sends
+``--interval`` seconds apart and reports send-to-receive latency
+percentiles. The cross-process scenario receives in a separate worker
+process, which the in-memory layer cannot do at all.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+from .channel_layers import UnixSocketChannelLayer
+
+
+async def _receive_all(layer, channels, expected):
+    latencies = []
+
+    async def drain(channel):
+        for _ in range(expected):
+            message = await layer.receive(channel)
+            latencies.append(time.perf_counter() - message['sent'])
+
+    await asyncio.gather(*(drain(channel) for channel in channels))
+    return latencies
+
+
+async def _send_all(layer, group, messages, window=None, interval=None):
+    for number in range(messages):
+        await layer.group_send(group, {'type': 'bench.message', 'n': number, 'sent': time.perf_counter()})
+        if interval:
+            await asyncio.sleep(interval)
+        elif number % window == window - 1:
+            # Yield now and then so receivers keep up instead of hitting capacity
+            await asyncio.sleep(0)
+
+
+async def _join(layer, members):
+    channels = [await layer.new_channel() for _ in range(members)]
+    for channel in channels:
+        await layer.group_add('bench', channel)
+    await asyncio.sleep(0.1)
+    return channels
+
+
+async def _same_process(layer, options):
+    channels = await _join(layer, options.members)
+    started = time.perf_counter()
+    receiving = asyncio.ensure_future(_receive_all(layer, channels, options.messages))
+    await _send_all(layer, 'bench', options.messages, window=options.window)
+    await receiving
+    elapsed = time.perf_counter() - started
+
+    receiving = asyncio.ensure_future(_receive_all(layer, channels, options.probes))
+    await _send_all(layer, 'bench', options.probes, interval=options.interval)
+    return options.messages * options.members / elapsed, await receiving
+
+
+def _remote_receiver(path, options, capacity, ready, results):
+    async def run():
+        layer = UnixSocketChannelLayer(path=path, capacity=capacity)
+        channels = await _join(layer, options.members)
+        for expected in (options.messages, options.probes):
+            ready.set()
+            results.put(await _receive_all(layer, channels, expected))
+        await layer.close()
+
+    asyncio.run(run())
+
+
+async def _cross_process(path, options, capacity):
+    loop = asyncio.get_running_loop()
+    context = multiprocessing.get_context('spawn')
+    ready, results = context.Event(), context.Queue()
+    layer = UnixSocketChannelLayer(path=path, capacity=capacity)
+    # Host the broker here so the receiver process connects to us
+    await layer.new_channel()
+    worker = context.Process(target=_remote_receiver, args=(path, options, capacity, ready, results))
+    worker.start()
+
+    await loop.run_in_executor(None, ready.wait)
+    ready.clear()
+    started = time.perf_counter()
+    await _send_all(layer, 'bench', options.messages, window=options.window)
+    await loop.run_in_executor(None, results.get)
+    elapsed = time.perf_counter() - started
+
+    await loop.run_in_executor(None, ready.wait)
+    await _send_all(layer, 'bench', options.probes, interval=options.interval)
+    latencies = await loop.run_in_executor(None, results.get)
+    worker.join()
+    await layer.close()
+    return options.messages * options.members / elapsed, latencies
+
+
+def _report(name, throughput, latencies):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<28} {throughput:>12,.0f} msg/s"
+        f"   p50 {quantiles[49] * 1e3:7.3f} ms   p99 {quantiles[98] * 1e3:7.3f} ms"
+        f"   max {latencies[-1] * 1e3:7.3f} ms"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--members', type=int, default=10)
+    parser.add_argument('--window', type=int, default=50, help="Group sends between yields to the receivers")
+    parser.add_argument('--probes', type=int, default=500, help="Paced sends used to measure latency")
+    parser.add_argument('--interval', type=float, default=0.002, help="Seconds between paced sends")
+    args = parser.parse_args(argv)
+    # Enough room that nothing is dropped while the receivers catch up
+    capacity = args.messages + 1
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sock')
+
+    print(f"{args.messages} group sends to {args.members} channels ({args.messages * args.members} deliveries)")
+    _report('in-memory, same process', *asyncio.run(
+        _same_process(InMemoryChannelLayer(capacity=capacity), args)
+    ))
+
+    async def unix_same_process():
+        layer = UnixSocketChannelLayer(path=path, capacity=capacity)
+        try:
+            return await _same_process(layer, args)
+        finally:
+            await layer.close()
+
+    _report('unix socket, same process', *asyncio.run(unix_same_process()))
+    _report('unix socket, cross process', *asyncio.run(_cross_process(path, args, capacity)))
+
+
+if __name__ == '__main__':
+    main()
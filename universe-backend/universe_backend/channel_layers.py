@@ -0,0 +1,598 @@
+# universe_backend/channel_layers.py
+"""
+Channel layer shared by the ASGI worker processes of one host.
+
+The first process to take the lock next to the socket path hosts a small
+broker on a Unix domain socket, and every process (the host included)
+connects to it. Groups and general channels live in the broker. Messages
+for process-specific channels (``prefix!suffix``) are pushed straight to the
+process that owns the prefix and queued there, so a consumer's receive()
+never waits on a round trip. If the hosting process goes away, the next
+process to reconnect takes the lock over and clients re-register their
+prefixes, groups and pending receives.
+
+Run a standalone broker with ``python -m universe_backend.channel_layers``.
+"""
+import argparse
+import asyncio
+import base64
+import copy
+import fcntl
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import string
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('!I')
+# Stop writing to a peer once this much is waiting in its send buffer
+_MAX_BUFFER = 8 * 1024 * 1024
+_SWEEP_INTERVAL = 1
+# The directory holding manage.py; the default socket path is scoped to it
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_path(project_dir=_PROJECT_DIR):
+    """
+    Socket path for this user and this checkout, so deployments from
+    different checkouts on one host (say dev and staging) never share a
+    broker and see each other's groups.
+    """
+    scope = hashlib.sha256(os.fsencode(project_dir)).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'universe-channels-{os.getuid()}-{scope}.sock')
+
+
+def _encode_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f'{type(value).__name__} values cannot be sent over the channel layer')
+
+
+def _decode_object(obj):
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+def pack(frame):
+    body = json.dumps(frame, default=_encode_value, separators=(',', ':')).encode()
+    return _HEADER.pack(len(body)) + body
+
+
+async def unpack(reader):
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return json.loads(await reader.readexactly(length), object_hook=_decode_object)
+
+
+def _write(writer, frame):
+    """Queue ``frame`` on ``writer``; False if the peer is gone or not keeping up."""
+    if writer.is_closing() or writer.transport.get_write_buffer_size() > _MAX_BUFFER:
+        return False
+    writer.write(pack(frame))
+    return True
+
+
+class Broker:
+    """
+    Routing state shared by every connected process.
+
+    Frames are JSON lists: ``listen``, ``send``, ``receive``, ``cancel``,
+    ``group_add``, ``group_discard``, ``group_send`` and ``flush`` from
+    clients; ``push``, ``reply`` and ``ack`` back to them.
+    """
+
+    def __init__(self, expiry=60, group_expiry=86400, capacity=100, get_capacity=None):
+        self.expiry = expiry
+        self.group_expiry = group_expiry
+        self.get_capacity = get_capacity or (lambda channel: capacity)
+        self.queues = {}
+        self.waiters = {}
+        self.owners = {}
+        self.groups = {}
+        self.connections = set()
+        self.server = None
+        self._sweeper = None
+
+    async def start(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = await asyncio.start_unix_server(self._serve, path)
+        os.chmod(path, 0o600)
+        self._sweeper = asyncio.ensure_future(self._sweep())
+
+    async def stop(self):
+        self._sweeper.cancel()
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                self._handle(writer, await unpack(reader))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("Dropping channel layer client after a bad frame")
+        finally:
+            self.connections.discard(writer)
+            for prefix, owner in list(self.owners.items()):
+                if owner is writer:
+                    del self.owners[prefix]
+            for channel, waiting in list(self.waiters.items()):
+                waiting = deque(waiter for waiter in waiting if waiter[0] is not writer)
+                if waiting:
+                    self.waiters[channel] = waiting
+                else:
+                    del self.waiters[channel]
+            writer.close()
+
+    def _handle(self, writer, frame):
+        op = frame[0]
+        if op == 'send':
+            _, request_id, channel, message = frame
+            delivered = self._deliver(channel, message)
+            if request_id is not None:
+                _write(writer, ['ack', request_id, delivered])
+        elif op == 'group_send':
+            _, group, message = frame
+            self._group_send(group, message)
+        elif op == 'group_add':
+            _, group, channel = frame
+            self.groups.setdefault(group, {})[channel] = time.time()
+        elif op == 'group_discard':
+            _, group, channel = frame
+            members = self.groups.get(group)
+            if members is not None:
+                members.pop(channel, None)
+                if not members:
+                    del self.groups[group]
+        elif op == 'receive':
+            _, request_id, channel = frame
+            message = self._pop(channel)
+            if message is None:
+                self.waiters.setdefault(channel, deque()).append((writer, request_id))
+            else:
+                _write(writer, ['reply', request_id, channel, message])
+        elif op == 'cancel':
+            _, request_id, channel = frame
+            waiting = self.waiters.get(channel)
+            if waiting is not None:
+                waiting = deque(waiter for waiter in waiting if waiter != (writer, request_id))
+                if waiting:
+                    self.waiters[channel] = waiting
+                else:
+                    del self.waiters[channel]
+        elif op == 'listen':
+            _, prefix = frame
+            self.owners[prefix] = writer
+            # Hand over whatever arrived while the owner was reconnecting
+            for channel in [channel for channel in self.queues if channel.startswith(prefix)]:
+                queue = self.queues.pop(channel)
+                now = time.time()
+                for expires, message in queue:
+                    if expires >= now:
+                        _write(writer, ['push', [channel], message])
+        elif op == 'flush':
+            _, request_id = frame
+            self.queues.clear()
+            self.groups.clear()
+            _write(writer, ['ack', request_id, True])
+        else:
+            raise ValueError(f'Unknown channel layer operation {op!r}')
+
+    def _owner(self, channel):
+        if '!' not in channel:
+            return None
+        return self.owners.get(channel[:channel.index('!') + 1])
+
+    def _deliver(self, channel, message):
+        owner = self._owner(channel)
+        if owner is not None:
+            return _write(owner, ['push', [channel], message])
+        waiting = self.waiters.get(channel)
+        while waiting:
+            writer, request_id = waiting.popleft()
+            if not waiting:
+                del self.waiters[channel]
+            if _write(writer, ['reply', request_id, channel, message]):
+                return True
+        queue = self.queues.setdefault(channel, deque())
+        if len(queue) >= self.get_capacity(channel):
+            return False
+        queue.append((time.time() + self.expiry, message))
+        return True
+
+    def _group_send(self, group, message):
+        # One frame per owning process rather than one per channel
+        by_owner = {}
+        for channel in self.groups.get(group, ()):
+            owner = self._owner(channel)
+            if owner is None:
+                self._deliver(channel, message)
+            else:
+                by_owner.setdefault(owner, []).append(channel)
+        for owner, channels in by_owner.items():
+            _write(owner, ['push', channels, message])
+
+    def _pop(self, channel):
+        queue = self.queues.get(channel)
+        now = time.time()
+        while queue:
+            expires, message = queue.popleft()
+            if not queue:
+                del self.queues[channel]
+            if expires >= now:
+                return message
+        return None
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(_SWEEP_INTERVAL)
+            now = time.time()
+            for channel, queue in list(self.queues.items()):
+                expired = False
+                while queue and queue[0][0] < now:
+                    queue.popleft()
+                    expired = True
+                if not queue:
+                    del self.queues[channel]
+                if expired:
+                    # Nobody is reading this channel any more
+                    for members in self.groups.values():
+                        members.pop(channel, None)
+            joined_after = now - self.group_expiry
+            for group, members in list(self.groups.items()):
+                for channel, joined_at in list(members.items()):
+                    if joined_at < joined_after:
+                        del members[channel]
+                if not members:
+                    del self.groups[group]
+
+
+class UnixSocketChannelLayer(BaseChannelLayer):
+    """
+    Channel layer for several worker processes on one host, with no
+    external service. All socket I/O happens on a background thread with
+    its own event loop, so the layer can be used from any event loop
+    (including ``async_to_sync``) like the in-memory layer.
+
+    Sends to a process-specific channel owned by another process are
+    acknowledged once the broker has routed them; if the owner's queue is
+    full the message is dropped there, the same as a full channel in a
+    group_send.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(
+        self,
+        path=None,
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        connect_timeout=5,
+        **kwargs,
+    ):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = path or default_path()
+        self.group_expiry = group_expiry
+        self.connect_timeout = connect_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+        await self._call(self._send, channel, message)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        return await self._call(self._receive, channel)
+
+    async def new_channel(self, prefix="specific."):
+        return await self._call(self._new_channel, prefix)
+
+    async def flush(self):
+        await self._call(self._flush)
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._call(self._group_add, group, channel)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+        await self._call(self._group_discard, group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        await self._call(self._group_send, group, message)
+
+    async def close(self):
+        with self._lock:
+            loop, self._pid, self._loop = self._loop, None, None
+        if loop is not None:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._shutdown(), loop))
+            loop.call_soon_threadsafe(loop.stop)
+
+    # Background I/O thread
+
+    async def _call(self, method, *args):
+        with self._lock:
+            if self._pid != os.getpid():
+                # First use, or first use after a fork: nothing is inherited
+                self._start()
+            loop = self._loop
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(method(*args), loop))
+
+    def _start(self):
+        self._pid = os.getpid()
+        self.client_id = uuid.uuid4().hex[:12]
+        self._loop = asyncio.new_event_loop()
+        self._queues = {}
+        self._receiving = Counter()
+        self._groups = {}
+        self._prefixes = set()
+        self._requests = {}
+        self._receives = {}
+        self._request_ids = itertools.count()
+        self._writer = None
+        self._connected = asyncio.Event()
+        self._closing = False
+        self._broker = None
+        self._lock_file = None
+        self._tasks = []
+
+        def run(loop):
+            asyncio.set_event_loop(loop)
+            self._tasks = [loop.create_task(self._maintain()), loop.create_task(self._sweep())]
+            loop.run_forever()
+
+        threading.Thread(target=run, args=(self._loop,), name='channel-layer-io', daemon=True).start()
+
+    async def _maintain(self):
+        delay = 0.05
+        while not self._closing:
+            try:
+                await self._elect()
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1)
+                continue
+            delay = 0.05
+
+            self._writer = writer
+            for prefix in self._prefixes:
+                _write(writer, ['listen', prefix])
+            for group, channels in self._groups.items():
+                for channel in channels:
+                    _write(writer, ['group_add', group, channel])
+            for request_id, (channel, _) in self._receives.items():
+                _write(writer, ['receive', request_id, channel])
+            self._connected.set()
+
+            try:
+                while True:
+                    self._dispatch(await unpack(reader))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                if not self._closing:
+                    logger.warning("Lost the channel layer broker at %s; reconnecting", self.path)
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+                # Delivery is at-most-once: sends in flight to a dead broker are lost
+                for future in self._requests.values():
+                    if not future.done():
+                        future.set_result(True)
+                self._requests.clear()
+
+    async def _elect(self):
+        if self._broker is not None:
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        self._broker = Broker(self.expiry, self.group_expiry, get_capacity=self.get_capacity)
+        await self._broker.start(self.path)
+        logger.info("Hosting the channel layer broker at %s (pid %s)", self.path, os.getpid())
+
+    async def _shutdown(self):
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        if self._broker is not None:
+            await self._broker.stop()
+        if self._lock_file is not None:
+            self._lock_file.close()
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(_SWEEP_INTERVAL)
+            now = time.time()
+            for channel, queue in list(self._queues.items()):
+                expired = False
+                while not queue.empty() and queue._queue[0][0] < now:
+                    queue.get_nowait()
+                    expired = True
+                if expired:
+                    # A channel nobody reads from leaves its groups, as in the in-memory layer
+                    for group, channels in list(self._groups.items()):
+                        if channel in channels:
+                            await self._group_discard(group, channel)
+                if queue.empty() and not self._receiving[channel]:
+                    del self._queues[channel]
+
+    def _dispatch(self, frame):
+        op = frame[0]
+        if op == 'push':
+            _, channels, message = frame
+            for position, channel in enumerate(channels):
+                self._enqueue(channel, message if position == 0 else copy.deepcopy(message))
+        elif op == 'reply':
+            _, request_id, channel, message = frame
+            pending = self._receives.pop(request_id, None)
+            if pending is not None and not pending[1].done():
+                pending[1].set_result(message)
+            elif self._writer is not None:
+                # The receive was cancelled after the broker answered it: put the message back
+                _write(self._writer, ['send', None, channel, message])
+        elif op == 'ack':
+            _, request_id, delivered = frame
+            future = self._requests.pop(request_id, None)
+            if future is not None and not future.done():
+                future.set_result(delivered)
+
+    def _enqueue(self, channel, message):
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = self._queues[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        try:
+            queue.put_nowait((time.time() + self.expiry, message))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _connection(self):
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"No channel layer broker reachable at {self.path}") from None
+        return self._writer
+
+    async def _request(self, frame):
+        writer = await self._connection()
+        request_id = next(self._request_ids)
+        future = self._requests[request_id] = asyncio.get_running_loop().create_future()
+        _write(writer, [frame[0], request_id, *frame[1:]])
+        return await future
+
+    async def _send(self, channel, message):
+        if self.non_local_name(channel) in self._prefixes:
+            delivered = self._enqueue(channel, copy.deepcopy(message))
+        else:
+            delivered = await self._request(['send', channel, message])
+        if not delivered:
+            raise ChannelFull(channel)
+
+    async def _receive(self, channel):
+        if self.non_local_name(channel) in self._prefixes:
+            queue = self._queues.get(channel)
+            if queue is None:
+                queue = self._queues[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+            self._receiving[channel] += 1
+            try:
+                while True:
+                    expires, message = await queue.get()
+                    if expires >= time.time():
+                        return message
+            finally:
+                self._receiving[channel] -= 1
+                if not self._receiving[channel]:
+                    del self._receiving[channel]
+                    if queue.empty():
+                        self._queues.pop(channel, None)
+
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._receives[request_id] = (channel, future)
+        try:
+            writer = await self._connection()
+            _write(writer, ['receive', request_id, channel])
+            return await future
+        except asyncio.CancelledError:
+            if self._receives.pop(request_id, None) is not None and self._writer is not None:
+                _write(self._writer, ['cancel', request_id, channel])
+            raise
+
+    async def _new_channel(self, prefix):
+        local = f'{prefix}.{self.client_id}!'
+        if local not in self._prefixes:
+            self._prefixes.add(local)
+            if self._writer is not None:
+                _write(self._writer, ['listen', local])
+        return local + ''.join(random.choice(string.ascii_letters) for _ in range(12))
+
+    async def _flush(self):
+        self._queues.clear()
+        self._groups.clear()
+        await self._request(['flush'])
+
+    async def _group_add(self, group, channel):
+        self._groups.setdefault(group, set()).add(channel)
+        _write(await self._connection(), ['group_add', group, channel])
+
+    async def _group_discard(self, group, channel):
+        channels = self._groups.get(group)
+        if channels is not None:
+            channels.discard(channel)
+            if not channels:
+                del self._groups[group]
+        _write(await self._connection(), ['group_discard', group, channel])
+
+    async def _group_send(self, group, message):
+        writer = await self._connection()
+        _write(writer, ['group_send', group, message])
+        if writer.transport.get_write_buffer_size() > _MAX_BUFFER // 2:
+            await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Unix socket channel layer broker in the foreground.")
+    parser.add_argument('path', nargs='?', default=default_path())
+    parser.add_argument('--expiry', type=int, default=60)
+    parser.add_argument('--group-expiry', type=int, default=86400)
+    parser.add_argument('--capacity', type=int, default=100)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    lock_file = open(args.path + '.lock', 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        parser.exit(1, f"Another process already hosts the broker at {args.path}\n")
+
+    async def serve():
+        broker = Broker(args.expiry, args.group_expiry, args.capacity)
+        await broker.start(args.path)
+        logger.info("Channel layer broker listening on %s", args.path)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# universe_backend/pagination.py
+
+
+def keyset_page(queryset, after_id=None, before_id=None, limit=50):
+    """
+    Return a bounded, oldest-first slice of ``queryset`` keyed on ``id``.
+
+    ``after_id`` returns up to ``limit`` rows newer than that id (polling for
+    new rows), ``before_id`` returns the ``limit`` rows just older than that id
+    (scrolling back), and with neither the latest ``limit`` rows are returned.
+    """
+    if after_id is not None:
+        return list(queryset.filter(id__gt=after_id).order_by('id')[:limit])
+    if before_id is not None:
+        queryset = queryset.filter(id__lt=before_id)
+    return list(reversed(queryset.order_by('-id')[:limit]))
+
+
+def keyset_params(params, after='after_id', before='before_id', default_limit=50, max_limit=200):
+    """Parse keyset query parameters, raising ValueError on malformed input."""
+    after_id = params.get(after)
+    before_id = params.get(before)
+    limit = int(params.get('limit', default_limit))
+    return {
+        'after_id': int(after_id) if after_id else None,
+        'before_id': int(before_id) if before_id else None,
+        'limit': min(max(limit, 1), max_limit),
+    }
@@ -61,7 +61,14 @@ INSTALLED_APPS = [
 ASGI_APPLICATION = 'universe_backend.asgi.application'
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        # Shares groups between worker processes on this host over a Unix socket
+        # (see universe_backend/channel_layers.py); in-memory where that is unavailable
+        'BACKEND': (
+            'universe_backend.channel_layers.UnixSocketChannelLayer' if os.name == 'posix'
+            else 'channels.layers.InMemoryChannelLayer'
+        ),
+        # The socket defaults to one per user and checkout; give each deployment
+        # sharing a checkout its own, e.g. 'CONFIG': {'path': '/run/universe/staging.sock'}
         # For production use Redis:
         # 'BACKEND': 'channels_redis.core.RedisChannelLayer',
         # 'CONFIG': {
@@ -0,0 +1,169 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from django.test import SimpleTestCase
+
+from .channel_layers import UnixSocketChannelLayer
+
+
+def _remote_peer(path, ready, done):
+    """Worker process: answer one message on 'test.ping' over 'test.pong', then wait for ``done``."""
+    async def run():
+        layer = UnixSocketChannelLayer(path=path)
+        await layer.new_channel()
+        ready.set()
+        message = await layer.receive('test.ping')
+        await layer.send('test.pong', {'type': 'pong', 'n': message['n'], 'pid': os.getpid()})
+        while not done.is_set():
+            await asyncio.sleep(0.05)
+        await layer.close()
+
+    asyncio.run(run())
+
+
+def _remote_host(path, ready):
+    """Worker process: host the broker until killed."""
+    async def run():
+        layer = UnixSocketChannelLayer(path=path)
+        await layer.new_channel()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+class UnixSocketChannelLayerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'layer.sock')
+
+    def make_layer(self, **kwargs):
+        layer = UnixSocketChannelLayer(path=self.path, **kwargs)
+        self.addCleanup(async_to_sync(layer.close))
+        return layer
+
+    def start_process(self, target, *args):
+        process = multiprocessing.get_context('spawn').Process(target=target, args=(self.path, *args))
+        process.start()
+        self.addCleanup(process.join, 5)
+        self.addCleanup(process.kill)
+        return process
+
+    async def settle(self, layer):
+        """Round trip through the broker, so everything ``layer`` sent before has been handled."""
+        await layer.send('test.settle', {'type': 'settle'})
+        await layer.receive('test.settle')
+
+    async def assertNothingReceived(self, layer, channel):
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive(channel), 0.3)
+
+    async def test_send_receive_in_process(self):
+        layer = self.make_layer()
+        channel = await layer.new_channel()
+        await layer.send(channel, {'type': 'local', 'payload': b'\x00\xff'})
+        await layer.send('test.general', {'type': 'general'})
+
+        self.assertEqual(await layer.receive(channel), {'type': 'local', 'payload': b'\x00\xff'})
+        self.assertEqual(await layer.receive('test.general'), {'type': 'general'})
+
+    async def test_send_receive_between_layers(self):
+        host, other = self.make_layer(), self.make_layer()
+        channel = await other.new_channel()
+        await host.send(channel, {'type': 'specific'})
+        self.assertEqual(await other.receive(channel), {'type': 'specific'})
+
+        waiting = asyncio.ensure_future(host.receive('test.general'))
+        await asyncio.sleep(0.1)
+        await other.send('test.general', {'type': 'general'})
+        self.assertEqual(await asyncio.wait_for(waiting, 5), {'type': 'general'})
+
+    async def test_send_receive_across_processes(self):
+        layer = self.make_layer()
+        await layer.new_channel()
+        ctx = multiprocessing.get_context('spawn')
+        ready, done = ctx.Event(), ctx.Event()
+        self.start_process(_remote_peer, ready, done)
+        self.addCleanup(done.set)
+        self.assertTrue(await asyncio.get_running_loop().run_in_executor(None, ready.wait, 30))
+
+        await layer.send('test.ping', {'type': 'ping', 'n': 7})
+        reply = await asyncio.wait_for(layer.receive('test.pong'), 10)
+        self.assertEqual(reply['n'], 7)
+        self.assertNotEqual(reply['pid'], os.getpid())
+
+    async def test_groups(self):
+        host, other = self.make_layer(), self.make_layer()
+        local, remote = await host.new_channel(), await other.new_channel()
+        await host.group_add('chat', local)
+        await other.group_add('chat', remote)
+        await host.group_add('chat', 'test.general')
+        await self.settle(host)
+        await self.settle(other)
+
+        await host.group_send('chat', {'type': 'hello'})
+        self.assertEqual(await host.receive(local), {'type': 'hello'})
+        self.assertEqual(await other.receive(remote), {'type': 'hello'})
+        self.assertEqual(await host.receive('test.general'), {'type': 'hello'})
+
+        await other.group_discard('chat', remote)
+        await self.settle(other)
+        await other.group_send('chat', {'type': 'bye'})
+        self.assertEqual(await host.receive(local), {'type': 'bye'})
+        await self.assertNothingReceived(other, remote)
+
+    async def test_takeover_when_host_exits(self):
+        ready = multiprocessing.get_context('spawn').Event()
+        process = self.start_process(_remote_host, ready)
+        self.assertTrue(await asyncio.get_running_loop().run_in_executor(None, ready.wait, 30))
+
+        layer = self.make_layer()
+        channel = await layer.new_channel()
+        await layer.group_add('chat', channel)
+        await self.settle(layer)
+        self.assertIsNone(layer._broker)
+
+        process.kill()
+        deadline = time.monotonic() + 10
+        while layer._broker is None or not layer._connected.is_set():
+            self.assertLess(time.monotonic(), deadline, "no process took the broker over")
+            await asyncio.sleep(0.05)
+
+        # The prefix and group membership were registered again with the new broker
+        await layer.group_send('chat', {'type': 'after takeover'})
+        self.assertEqual(await asyncio.wait_for(layer.receive(channel), 5), {'type': 'after takeover'})
+
+    async def test_capacity(self):
+        host, other = self.make_layer(capacity=2), self.make_layer(capacity=2)
+        channel = await other.new_channel()
+        for layer, target in ((other, channel), (host, 'test.general'), (other, 'test.remote')):
+            for number in range(2):
+                await layer.send(target, {'type': 'fill', 'n': number})
+            with self.assertRaises(ChannelFull):
+                await layer.send(target, {'type': 'overflow'})
+            await layer.receive(target)
+            await layer.send(target, {'type': 'fits again'})
+
+    async def test_expiry(self):
+        with mock.patch('universe_backend.channel_layers._SWEEP_INTERVAL', 0.05):
+            layer = self.make_layer(expiry=0.2)
+            channel = await layer.new_channel()
+            await layer.send(channel, {'type': 'stale'})
+            await layer.send('test.general', {'type': 'stale'})
+            await layer.group_add('chat', 'test.member')
+            await layer.group_send('chat', {'type': 'unread'})
+            await asyncio.sleep(0.5)
+
+            await self.assertNothingReceived(layer, channel)
+            await self.assertNothingReceived(layer, 'test.general')
+            # The member never read its message, so the sweep took it out of the group
+            await layer.group_send('chat', {'type': 'later'})
+            await self.assertNothingReceived(layer, 'test.member')
@@ -0,0 +1,101 @@
+# universe_backend/write_behind.py
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Coalesce items submitted by many coroutines and flush them in batches.
+
+    ``flush`` is an async callable that receives the queued items in
+    submission order and returns one result per item. ``submit`` only
+    returns once the batch holding its item has been flushed, so callers
+    can treat its result as a durable acknowledgement. Batches are flushed
+    one at a time, in order.
+    """
+
+    def __init__(self, flush, max_batch=100, max_delay=0.05):
+        self._flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+        return await future
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                results = await self._flush([item for item, _ in batch])
+            except Exception as exc:
+                logger.exception("Write-behind flush of %d items failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def drain(self):
+        """Flush until nothing is queued, e.g. before the queue is dropped."""
+        while self._pending:
+            await self.flush()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _schedule_flush(self):
+        self._timer = None
+        self._task = asyncio.ensure_future(self.flush())
+
+
+class QueuePool:
+    """
+    Share one queue per key (a chat room, a study group) between the
+    connections using it. ``factory(key)`` builds the queue on first
+    ``acquire``; the last ``release`` drains it and drops it.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._entries = {}
+
+    def acquire(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [self._factory(key), 0]
+        entry[1] += 1
+        return entry[0]
+
+    async def release(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        await entry[0].drain()
+        if entry[1] <= 0 and self._entries.get(key) is entry:
+            del self._entries[key]
+
+    async def drain(self):
+        for queue, _ in list(self._entries.values()):
+            await queue.drain()
+
+    def __len__(self):
+        return len(self._entries)
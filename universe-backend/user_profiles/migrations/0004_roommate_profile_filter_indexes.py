@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profiles', '0003_alter_userprofile_interests'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='roommateprofile',
+            name='max_rent_budget',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='roommateprofile',
+            name='preferred_move_in_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='roommateprofile',
+            index=models.Index(fields=['smoking_preference', 'guests_preference', 'cleanliness_level'], name='user_profil_smoking_df3f52_idx'),
+        ),
+    ]
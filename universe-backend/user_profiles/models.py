@@ -44,8 +44,14 @@ class RoommateProfile(models.Model):
     study_habits = models.CharField(max_length=20, choices=STUDY_HABITS, default='library')
     guests_preference = models.CharField(max_length=20, choices=PREFERENCE_CHOICES, default='no_preference')
     cleanliness_level = models.IntegerField(default=3, help_text="Scale of 1-5, 5 being the cleanest")
-    max_rent_budget = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    preferred_move_in_date = models.DateField(null=True, blank=True)
+    max_rent_budget = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, db_index=True)
+    preferred_move_in_date = models.DateField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Deal-breaker filters on roommate matches
+            models.Index(fields=['smoking_preference', 'guests_preference', 'cleanliness_level']),
+        ]
     
     def __str__(self):
         return f"{self.user_profile.user.username}'s roommate preferences"
\ No newline at end of file
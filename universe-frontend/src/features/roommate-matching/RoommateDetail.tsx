@@ -29,12 +29,29 @@ const RoommateDetail: React.FC = () => {
   const typingTimeoutRef = useRef<NodeJS.Timeout | null>(null);
   const currentUserId = parseInt(localStorage.getItem('user_id') || '0');
   const messagesEndRef = useRef<HTMLDivElement | null>(null);
+  const lastMessageIdRef = useRef<number | null>(null);
+
+  // Merge by id so polls, socket frames and our own posts never duplicate or drop messages.
+  // Only polled pages advance the cursor: they are complete up to their last id.
+  const mergeMessages = (incoming: Message[], polled = false) => {
+    if (polled && incoming.length) {
+      lastMessageIdRef.current = Number(incoming[incoming.length - 1].id);
+    }
+    setMessages((prev) => {
+      const byId = new Map(prev.map((m) => [String(m.id), m]));
+      incoming.forEach((m) => byId.set(String(m.id), m));
+      return Array.from(byId.values());
+    });
+  };
+
   const fetchMessages = async () => {
     if (!matchRequest?.id) return;
   
     try {
-      const res = await axios.get(`/api/messages/?match_request=${matchRequest.id}`);
-      setMessages(res.data);
+      // After the first page, poll only for messages newer than the last one seen
+      const after = lastMessageIdRef.current ? `&after_id=${lastMessageIdRef.current}` : '';
+      const res = await axios.get(`/api/messages/?match_request=${matchRequest.id}${after}`);
+      mergeMessages(res.data, true);
     } catch (err) {
       console.error('Error fetching messages:', err);
     }
@@ -49,7 +66,9 @@ const RoommateDetail: React.FC = () => {
 
       if (response.data.match_request?.status === 'accepted') {
         const msgRes = await axios.get(`/api/messages/?match_request=${response.data.match_request.id}`);
-        setMessages(msgRes.data);
+        lastMessageIdRef.current = null;
+        setMessages([]);
+        mergeMessages(msgRes.data, true);
       }
 
       setLoading(false);
@@ -102,18 +121,21 @@ const RoommateDetail: React.FC = () => {
 
       if (data.type === 'chat_message') {
         const msg: Message = {
-          id: String(Date.now()),
+          id: String(data.message.id ?? Date.now()),
           content: data.message.content,
           sender: data.message.sender,
           timestamp: data.message.timestamp
         };
-        setMessages((prev) => [...prev, msg]);
+        mergeMessages([msg]);
       }
 
       if (data.type === 'typing_indicator') {
-        setIsTyping(true);
+        // The server sends only start/stop transitions; the timeout is a fallback
         if (typingTimeoutRef.current) clearTimeout(typingTimeoutRef.current);
-        typingTimeoutRef.current = setTimeout(() => setIsTyping(false), 2000);
+        setIsTyping(data.typing !== false);
+        if (data.typing !== false) {
+          typingTimeoutRef.current = setTimeout(() => setIsTyping(false), 10000);
+        }
       }
     };
 
@@ -138,7 +160,7 @@ const RoommateDetail: React.FC = () => {
       });
   
       // ✅ Optimistically add the message to UI immediately
-      setMessages(prev => [...prev, res.data]);
+      mergeMessages([res.data]);
   
       // ✅ Send via WebSocket (optional redundancy)
       if (socketRef.current?.readyState === WebSocket.OPEN) {
@@ -38,7 +38,7 @@ const StudyGroupDetail: React.FC = () => {
 
   const fetchPendingRequests = async () => {
     if (!group || group.creator !== userId) return;
-    const res = await axios.get('/api/study-groups/memberships/');
+    const res = await axios.get(`/api/study-groups/memberships/?group=${id}`);
     const pending = res.data.filter(
       (r: GroupMembership) => r.group === parseInt(id!) && !r.is_accepted
     );
@@ -49,10 +49,21 @@ const StudyGroupDetail: React.FC = () => {
     setAcceptedMembers(accepted);
   };
 
+  const lastMessageIdRef = useRef<number | null>(null);
+
   const fetchMessages = async () => {
     try {
-      const res = await axios.get(`/api/study-groups/messages/?group=${id}`);
-      setMessages(res.data);
+      // After the first page, poll only for messages newer than the last one seen
+      const since = lastMessageIdRef.current ? `&since_id=${lastMessageIdRef.current}` : '';
+      const res = await axios.get(`/api/study-groups/messages/?group=${id}${since}`);
+      if (res.data.length) {
+        lastMessageIdRef.current = res.data[res.data.length - 1].id;
+      }
+      setMessages((prev) => {
+        const byId = new Map(prev.map((m) => [m.id, m]));
+        res.data.forEach((m: GroupMessage) => byId.set(m.id, m));
+        return Array.from(byId.values()).sort((a, b) => a.id - b.id);
+      });
     } catch (err) {
       console.error('Failed to fetch messages', err);
     }
@@ -7,6 +7,9 @@ export interface StudyGroup {
     subject_tags: string[];
     creator: number;
     created_at: string;
+    member_count?: number;
+    pending_count?: number;
+    is_member?: boolean;
   }
   
   export interface GroupMembership {